@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from collections import defaultdict
+
+# 调用阶段标签
+STAGE_PLAN = "plan"
+STAGE_PARAM_REGEN = "param-regen"
+STAGE_SUMMARY = "summary"
+STAGE_TRANSLATE = "translate"
+STAGE_GS_TITLES = "gs-titles"
+STAGE_OTHER = "other"
+# 评测阶段使用 "judge-<维度>"，如 judge-correctness
+
+_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")
+
+
+class UsageLedger:
+    """
+    记录每一次 LLM 调用的阶段、模型、token 用量与耗时，并按阶段汇总，
+    用于定位预算消耗在哪个阶段以及为整次运行设置 token 上限
+    """
+
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+            self._stages = defaultdict(lambda: defaultdict(float))
+
+    def record(self, stage, model, usage, latency, error=None):
+        stage = stage or STAGE_OTHER
+        usage = usage or {}
+        call = {
+            "stage": stage,
+            "model": model,
+            **{field: usage.get(field, 0) for field in _FIELDS},
+            "response_cached": bool(usage.get("response_cached")),
+            "latency": round(latency, 3),
+        }
+        if error is not None:
+            call["error"] = str(error)
+        with self._lock:
+            self.calls.append(call)
+            totals = self._stages[stage]
+            totals["calls"] += 1
+            totals["latency"] += latency
+            totals["response_cached"] += call["response_cached"]
+            totals["errors"] += error is not None
+            for field in _FIELDS:
+                totals[field] += call[field]
+        if self.verbose:
+            print(f"[usage] stage={stage} model={model} prompt={call['prompt_tokens']} "
+                  f"completion={call['completion_tokens']} cached={call['cached_tokens']} "
+                  f"latency={call['latency']}s{' (本地缓存)' if call['response_cached'] else ''}"
+                  f"{' error' if error is not None else ''}")
+
+    def total_tokens(self):
+        with self._lock:
+            return int(sum(totals["total_tokens"] for totals in self._stages.values()))
+
+    def summary(self):
+        with self._lock:
+            stages = {}
+            for stage, totals in self._stages.items():
+                calls = int(totals["calls"])
+                stages[stage] = {
+                    "calls": calls,
+                    **{field: int(totals[field]) for field in _FIELDS},
+                    "response_cached": int(totals["response_cached"]),
+                    "errors": int(totals["errors"]),
+                    "latency_total": round(totals["latency"], 3),
+                    "latency_avg": round(totals["latency"] / calls, 3) if calls else 0.0,
+                }
+        total = {"calls": sum(s["calls"] for s in stages.values())}
+        for field in _FIELDS + ("response_cached", "errors", "latency_total"):
+            total[field] = round(sum(s[field] for s in stages.values()), 3)
+        return {"total": total, "stages": stages}
+
+    def write(self, path):
+        """将按阶段汇总的结果写入 JSON 文件"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+
+def usage_path_for(output_file):
+    """与输出文件同目录、同名的用量汇总文件路径，如 out.json -> out.usage.json"""
+    base, _ = os.path.splitext(output_file)
+    return base + ".usage.json"
+
+
+# 进程级账本，所有 LLM 调用都记录在这里
+ledger = UsageLedger()
@@ -1,12 +1,17 @@
 import asyncio
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 import os
 import httpx
 import re
 import sys
 from llm import llm_client
 
-from config import API_TOKEN, API_CONFIG
+from config import API_TOKEN, API_CONFIG, AMINER_BASE_URL
+from config import AMINER_HTTP_MAX_CONNECTIONS, AMINER_HTTP_MAX_KEEPALIVE_CONNECTIONS, AMINER_HTTP_KEEPALIVE_EXPIRY, AMINER_HTTP2
+from http_pool import get_async_http_client, close_async_http_clients
+from replay import replay_async
+from resilience import endpoint_policy, CircuitOpenError
+from projection import loads, project
 
 
 import logging
@@ -18,8 +23,16 @@ import streamlit as st
 
 
 class AMinerAPI:
+    """
+    AMiner datacenter API 客户端
+    所有实例共享同一个长连接 httpx.AsyncClient（见 http_pool.py），创建实例本身没有连接开销；
+    流水线在批次开始 / 结束时调用 startup() / shutdown() 预热和释放连接池
+    """
+
+    POOL_NAME = "aminer"
+
     def __init__(self):
-        self.base_url = "https://datacenter.aminer.cn"
+        self.base_url = AMINER_BASE_URL
         self.token = API_TOKEN
         self.api_config = API_CONFIG
         self.headers = {
@@ -27,13 +40,35 @@ class AMinerAPI:
             "Authorization": f"Bearer {self.token}" 
         }
 
-    async def call_api(self, api_name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    @classmethod
+    def client(cls) -> httpx.AsyncClient:
+        """当前事件循环中共享的 httpx.AsyncClient"""
+        return get_async_http_client(
+            cls.POOL_NAME,
+            max_connections=AMINER_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=AMINER_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=AMINER_HTTP_KEEPALIVE_EXPIRY,
+            http2=AMINER_HTTP2,
+        )
+
+    @classmethod
+    async def startup(cls):
+        """创建共享客户端（在事件循环内调用）"""
+        cls.client()
+
+    @classmethod
+    async def shutdown(cls):
+        """关闭共享客户端及其长连接（在事件循环结束前调用）"""
+        await close_async_http_clients(cls.POOL_NAME)
+
+    async def call_api(self, api_name: str, payload: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         异步调用指定的 API
         
         Args:
             endpoint (str): API 的相对路径
             payload (Dict[str, Any]): 请求的 JSON 数据
+            fields (List[str]): 字段投影，只保留 data 中每条记录的这些字段
         
         Returns:
             Dict[str, Any]: API 返回的 JSON 数据
@@ -43,46 +78,47 @@ class AMinerAPI:
 
         if api_name not in self.api_config:
             return {"error": "Invalid API name", "details": f"Unknown API: {api_name}"}
-        
-           
-
-        # 新的API调用
 
+        # 录制/回放模式下由 replay 决定是否真正发出请求
+        request = {"api_name": api_name, "payload": payload}
+        if fields:
+            request["fields"] = sorted(fields)
+        return await replay_async(
+            "aminer",
+            request,
+            lambda: self._request(api_name, payload, fields),
+        )
+
+    async def _request(self, api_name: str, payload: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """向 datacenter 发出实际的 HTTP 请求，超时、重试与熔断按接口配置（见 resilience.py）"""
+        method = self.api_config[api_name]["method"]
+        if method not in ("GET", "POST"):
+            return {"error": "Unsupported HTTP method", "details": f"Method {method} is not supported"}
+
+        try:
+            response = await endpoint_policy(api_name).call(
+                lambda timeout: self._send(api_name, payload, timeout)
+            )
+            return project(response, fields)
+        except CircuitOpenError as e:
+            return {"error": "Circuit open", "details": str(e)}
+        except httpx.HTTPStatusError as e:
+            return {"error": f"HTTP Error: {e.response.status_code}", "details": e.response.text}
+        except Exception as e:
+            return {"error": "Request failed", "details": str(e)}
+
+    async def _send(self, api_name: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """单次请求，失败时抛出异常由容错策略决定是否重试"""
         api_info = self.api_config[api_name]
-        endpoint = api_info["endpoint"]
-        method = api_info["method"]
-
-        async with httpx.AsyncClient() as client:
-            try:
-                url = f"{self.base_url}{endpoint}"
-
-                if method == "GET":
-                    response = await client.get(
-                        url=url,
-                        headers=self.headers,
-                        params=payload,
-                        timeout=10.0  # 设置超时时间
-                    )
-                    response.raise_for_status()
-                    return response.json()  
-                
-                elif method == "POST":
-                    response = await client.post(
-                        url=f"{self.base_url}{endpoint}",
-                        headers=self.headers,
-                        json=payload,
-                        timeout=10.0  
-                    )
-                    response.raise_for_status()
-                    return response.json()  
-                
-                else:
-                    return {"error": "Unsupported HTTP method", "details": f"Method {method} is not supported"}
-
-            except httpx.HTTPStatusError as e:
-                return {"error": f"HTTP Error: {e.response.status_code}", "details": e.response.text}
-            except Exception as e:
-                return {"error": "Request failed", "details": str(e)}
+        url = f"{self.base_url}{api_info['endpoint']}"
+
+        client = self.client()
+        if api_info["method"] == "GET":
+            response = await client.get(url=url, headers=self.headers, params=payload, timeout=timeout)
+        else:
+            response = await client.post(url=url, headers=self.headers, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return loads(response.content)
 
 # 测试调用 AMiner API
 async def main():
@@ -114,6 +150,7 @@ async def main():
 
     response = await aminer_api.call_api(api_name="search_author_id(1)", payload=payload)
     print(response)
+    await AMinerAPI.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,8 +1,9 @@
 
 import asyncio
 from typing_extensions import Annotated, Doc
-from tools import search_paper_id_tool, search_paper_detail_tool, search_author_id_tool, search_author_detail_tool, \
-    search_venue_id_tool, search_venue_detail_tool, search_org_id_tool, search_org_detail_tool
+from tools import search_paper_id_tool, search_author_id_tool, search_venue_id_tool, search_org_id_tool
+from detail_batcher import fetch_details
+from search_cache import cached_search
 
 async def search_paper_id(
     titles: Annotated[list, Doc("标题列表")] = None,
@@ -19,34 +20,95 @@ async def search_paper_id(
     venues: Annotated[list, Doc("期刊或会议列表，使用英文小写缩写，不需要带年份")] = None,
     venue_ids: Annotated[list, Doc("期刊或会议ID列表")] = None,
     size: Annotated[int, Doc("返回结果数量")] = 10,
+    offset: Annotated[int, Doc("结果偏移量，用于分页")] = None,
 ):
     
-    result = await search_paper_id_tool(
-        titles=titles,    
-        keywords=keywords,
-        years=years,
-        is_sci=is_sci,
-        language=language,
-        sort=sort,
-        author=author,
-        author_id=author_id,
-        coauthors=coauthors,
-        org=org,
-        org_id=org_id,
-        venues=venues,
-        venue_ids=venue_ids,
-        size=size
-    )
+    params = {
+        "titles": titles,
+        "keywords": keywords,
+        "years": years,
+        "is_sci": is_sci,
+        "language": language,
+        "sort": sort,
+        "author": author,
+        "author_id": author_id,
+        "coauthors": coauthors,
+        "org": org,
+        "org_id": org_id,
+        "venues": venues,
+        "venue_ids": venue_ids,
+        "size": size,
+        "offset": offset,
+    }
+    # 规范化参数后查本地缓存，等价检索不再重复请求
+    result = await cached_search("search_paper_id", params, lambda: search_paper_id_tool(**params))
 
     return result
 
+async def _paginate(search, params, page_size, max_results):
+    """
+    按 offset / size 逐页拉取检索结果，逐条产出
+    当前页交给调用方处理时已在后台请求下一页；取够 max_results 条、
+    结果不足一页或调用方提前退出时停止，内存中最多保留两页
+    """
+    params = {k: v for k, v in params.items() if k not in ("size", "offset")}
+
+    def fetch(offset):
+        # 第一页不带 offset，与普通检索的请求和缓存键一致
+        if offset:
+            return asyncio.ensure_future(search(**params, size=page_size, offset=offset))
+        return asyncio.ensure_future(search(**params, size=page_size))
+
+    offset = 0
+    yielded = 0
+    previous = None
+    page = None
+    try:
+        page = fetch(offset)
+        while page is not None:
+            response = await page
+            page = None
+            data = response.get("data") if isinstance(response, dict) else None
+            if not isinstance(data, list):
+                if isinstance(response, dict) and response.get("error"):
+                    print(f"分页检索失败（offset={offset}）: {response}")
+                return
+            # 服务端忽略 offset 时会反复返回同一页，此时停止
+            if not data or data == previous:
+                return
+            previous = data
+            offset += len(data)
+            if len(data) >= page_size and (max_results is None or offset < max_results):
+                page = fetch(offset)
+            for item in data:
+                if max_results is not None and yielded >= max_results:
+                    return
+                yielded += 1
+                yield item
+    finally:
+        # 调用方提前退出时取消已发出的预取请求（需经 aclosing 关闭生成器才会立即执行）
+        if page is not None and not page.done():
+            page.cancel()
+
+
+def iter_paper_ids(page_size=10, max_results=None, **params):
+    """
+    search_paper_id 的分页迭代器，参数同 search_paper_id（不含 size / offset）
+    用 contextlib.aclosing 包裹，提前 break 时立即取消后台预取的下一页：
+
+        async with aclosing(iter_paper_ids(author="Yoshua Bengio", max_results=100)) as papers:
+            async for paper in papers:
+                ...
+    """
+    return _paginate(search_paper_id, params, page_size, max_results)
+
+
 async def search_paper_detail(
     paper_ids: Annotated[list, Doc("论文ID列表")] = None
 ):
 
-    result = await search_paper_detail_tool(
-        paper_ids=paper_ids
-    )
+    # 并发的详情查询在短窗口内合并为一次批量请求
+    result = await fetch_details("search_paper_detail", paper_ids)
 
     return result
 
@@ -59,30 +121,38 @@ async def search_author_id(
     venues: Annotated[list, Doc("期刊或会议列表，使用英文小写缩写，不需要带年份")] = None,
     venue_ids: Annotated[list, Doc("期刊或会议ID列表")] = None,
     sort: Annotated[str, Doc("排序方式: n_citation, n_pubs, h_index")] = "n_citation",
-    size: Annotated[int, Doc("返回结果数量")] = 10
+    size: Annotated[int, Doc("返回结果数量")] = 10,
+    offset: Annotated[int, Doc("结果偏移量，用于分页")] = None,
 ):
 
-    result = await search_author_id_tool(
-        author=author,
-        orgs=orgs,
-        org_ids=org_ids,
-        interests=interests,
-        nations=nations,
-        venues=venues,
-        venue_ids=venue_ids,
-        sort=sort,
-        size=size
-    )
+    params = {
+        "author": author,
+        "orgs": orgs,
+        "org_ids": org_ids,
+        "interests": interests,
+        "nations": nations,
+        "venues": venues,
+        "venue_ids": venue_ids,
+        "sort": sort,
+        "size": size,
+        "offset": offset,
+    }
+    # 规范化参数后查本地缓存，等价检索不再重复请求
+    result = await cached_search("search_author_id", params, lambda: search_author_id_tool(**params))
 
     return result
 
+def iter_author_ids(page_size=10, max_results=None, **params):
+    """search_author_id 的分页迭代器，参数同 search_author_id（不含 size / offset），用法同 iter_paper_ids"""
+    return _paginate(search_author_id, params, page_size, max_results)
+
+
 async def search_author_detail(
     author_ids: Annotated[list, Doc("学者ID列表")] = None
 ):
 
-    result = await search_author_detail_tool(
-        author_ids=author_ids
-    )
+    # 并发的详情查询在短窗口内合并为一次批量请求
+    result = await fetch_details("search_author_detail", author_ids)
 
     return result
 
@@ -96,15 +166,17 @@ async def search_venue_id(
     size: Annotated[int, Doc("返回结果数量")] = 10
 ):
 
-    result = await search_venue_id_tool(
-        venue=venue,
-        type=type,
-        keywords=keywords,
-        category=category,
-        source=source,
-        source_tier=source_tier,
-        size=size
-    )
+    params = {
+        "venue": venue,
+        "type": type,
+        "keywords": keywords,
+        "category": category,
+        "source": source,
+        "source_tier": source_tier,
+        "size": size,
+    }
+    # 规范化参数后查本地缓存，等价检索不再重复请求
+    result = await cached_search("search_venue_id", params, lambda: search_venue_id_tool(**params))
 
     return result
 
@@ -112,9 +184,8 @@ async def search_venue_detail(
     venue_ids: Annotated[list, Doc("期刊或会议ID列表")] = None
 ):
 
-    result = await search_venue_detail_tool(
-        venue_ids=venue_ids
-    )
+    # 并发的详情查询在短窗口内合并为一次批量请求
+    result = await fetch_details("search_venue_detail", venue_ids)
 
     return result
 
@@ -122,9 +193,11 @@ async def search_org_id(
     orgs: Annotated[list, Doc("机构或学校名称列表")] = None,
 ):
 
-    result = await search_org_id_tool(
-        orgs=orgs
-    )
+    params = {
+        "orgs": orgs,
+    }
+    # 规范化参数后查本地缓存，等价检索不再重复请求
+    result = await cached_search("search_org_id", params, lambda: search_org_id_tool(**params))
 
     return result
 
@@ -132,9 +205,8 @@ async def search_org_detail(
     org_ids: Annotated[list, Doc("机构或学校ID列表")] = None
 ):
 
-    result = await search_org_detail_tool(
-        org_ids=org_ids
-    )
+    # 并发的详情查询在短窗口内合并为一次批量请求
+    result = await fetch_details("search_org_detail", org_ids)
 
     return result
 
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def make_key(*parts):
+    """将任意可 JSON 序列化的内容哈希为稳定的缓存键"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    基于 SQLite 的持久化键值缓存，值以 JSON 形式存储
+
+    - ttl: 默认过期时间（秒），None 表示不过期；set 时可单独指定
+    - max_entries / max_bytes: 容量上限，超出后按最近访问时间淘汰（LRU）
+    - hits / misses: 命中统计，可通过 stats() 查看
+    """
+
+    # 每写入多少次检查一次容量，避免每次写入都统计全表
+    EVICT_EVERY = 32
+
+    def __init__(self, path, ttl=None, max_entries=None, max_bytes=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires REAL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, expires = row
+            if expires is not None and expires <= now:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                conn.commit()
+                self.misses += 1
+                return default
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires = now + ttl if ttl is not None else None
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, raw, len(raw), expires, now),
+            )
+            conn.commit()
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(conn, now)
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache")
+            conn.commit()
+
+    def evict(self):
+        """立即执行一次过期清理与容量淘汰"""
+        with self._lock:
+            self._evict(self._connect(), time.time())
+
+    def _evict(self, conn, now):
+        removed = conn.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (now,)).rowcount
+        if self.max_entries is not None:
+            count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count > self.max_entries:
+                removed += conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+        if self.max_bytes is not None:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                # 按访问时间从旧到新累计，删除到容量降至上限以内
+                excess = total - self.max_bytes
+                keys = []
+                for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+                    keys.append(key)
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+                removed += len(keys)
+        conn.commit()
+        self.evictions += removed
+
+    def stats(self):
+        with self._lock:
+            conn = self._connect()
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
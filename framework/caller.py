@@ -5,7 +5,8 @@ import asyncio
 _CALLER_DIR = os.path.dirname(os.path.abspath(__file__))
 
 from api import AMinerAPI
-from llm import llm_client
+from router import routed_llm_client
+from accounting import STAGE_PARAM_REGEN
 import logging
 import sys
 import streamlit as st
@@ -14,6 +15,9 @@ from config import GEMINI_API_KEY, GEMINI_API_BASE, GEMINI_MODEL
 from new_tool_async import search_paper_id_gs
 
 from tools import search_paper_id_tool, search_paper_detail_tool, search_author_detail_tool
+from detail_batcher import fetch_details
+from search_cache import cached_search
+from param_validation import validate_params, ParamValidationError
 
 # 彻底清除旧的 `logging` 配置，确保 `logger` 正确生效
 for handler in logging.root.handlers[:]:
@@ -297,6 +301,9 @@ type	string	机构类型
 
 """
 
+# 任务结果中保留的字段：工具层按此做字段投影，解码后只保留这些字段
+NECESSARY_FIELDS = ["paper_id", "id", "interests","n_citation", "citation", "name","gender","org","org_name", "org_id","title","_id","authors","abstract","keywords","orgid","venue","year","ai_interests","bio","bio_zh","emails","nation","position","position_zh","work", "h_index"]
+
 class TaskExecutor:
     def __init__(self, tasks):
         self.tasks = {task["name"]: task for task in tasks}
@@ -305,15 +312,22 @@ class TaskExecutor:
         self.inputs = {}
         self.dependencies = {task["name"]: set(task["rely"]) for task in tasks}
         self.pending_tasks = {task["name"]: task for task in tasks if not task["rely"]}
+        # AMinerAPI 实例共享进程级连接池，整个执行器复用同一个实例
+        self.aminer_api = AMinerAPI()
 
     async def execute_api_call(self, api_name, params):
-        aminer_api = AMinerAPI()
         logger.debug(f"调用{api_name}，传入参数: {params}")
         API_PARAM[api_name] = params
         try:
             # todo 更加优雅, 删除（1）等
             api_name = re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*', api_name).group(0)
 
+            # 走自定义服务器的接口先按 apis.py 签名在本地校验 / 转换参数，参数有误时不发请求
+            if api_name == "search_paper_id":
+                params = validate_params(api_name, params)
+            elif api_name in ("search_paper_detail", "search_author_detail"):
+                params = validate_params(api_name, params, strict=True)
+
             # 新的API调用
             if api_name == "search_paper_id":
                 # 处理 coauthors 参数格式
@@ -327,29 +341,49 @@ class TaskExecutor:
                     # 如果是空字符串，删除该参数
                     elif not params["coauthors"]:
                         del params["coauthors"]
-                # 移除可能存在的 use_topic 参数，因为 search_paper_id_tool 不接受这个参数
-                if "use_topic" in params:
-                    del params["use_topic"]
-                response = await search_paper_id_tool(**params)
+                response = await cached_search(
+                    api_name, params,
+                    lambda: search_paper_id_tool(fields=NECESSARY_FIELDS, **params),
+                    fields=NECESSARY_FIELDS,
+                )
 
             elif api_name == "search_paper_detail":
-                response = await search_paper_detail_tool(**params)
+                # 只有 ID 参数时与其他任务的同类查询合并为一次批量请求
+                if set(params) == {"paper_ids"}:
+                    response = await fetch_details(api_name, params["paper_ids"], NECESSARY_FIELDS)
+                else:
+                    response = await search_paper_detail_tool(fields=NECESSARY_FIELDS, **params)
 
             elif api_name == "search_author_detail":
-                # 将ids参数转换为author_ids
-                if "ids" in params:
-                    params["author_ids"] = params.pop("ids")
-                response = await search_author_detail_tool(**params)
+                if set(params) == {"author_ids"}:
+                    response = await fetch_details(api_name, params["author_ids"], NECESSARY_FIELDS)
+                else:
+                    response = await search_author_detail_tool(fields=NECESSARY_FIELDS, **params)
+
+            elif api_name in ("search_venue_detail", "search_org_detail") and set(params) == {"ids"}:
+                response = await fetch_details(f"aminer:{api_name}", params["ids"], NECESSARY_FIELDS)
+                logger.debug(f"调用{api_name}，返回: {response}")
+
+            elif api_name in ("search_author_id", "search_venue_id", "search_org_id"):
+                response = await cached_search(
+                    f"aminer:{api_name}", params,
+                    lambda: self.aminer_api.call_api(api_name=api_name, payload=params, fields=NECESSARY_FIELDS),
+                    fields=NECESSARY_FIELDS,
+                )
+                logger.debug(f"调用{api_name}，返回: {response}")
 
             elif api_name == "search_paper_id_gs":
                 response = await search_paper_id_gs(**params)
                 
             else:
-                response = await aminer_api.call_api(api_name=api_name, payload=params)
+                response = await self.aminer_api.call_api(api_name=api_name, payload=params, fields=NECESSARY_FIELDS)
                 logger.debug(f"调用{api_name}，返回: {response}")
 
             return params, response
 
+        except ParamValidationError as e:
+            print(f"Invalid params for {api_name}: {e}")
+            return params, {"error": "Invalid params", "details": str(e)}
         except Exception as e:
             print(f"Error calling {api_name}: {e}")
             return params,{{api_name}: {str(e)}}
@@ -434,10 +468,12 @@ class TaskExecutor:
             print("~~~输入~~~")
             print("Query:", query)
 
-            # 使用 llm_client 的默认 Gemini 配置，不再显式传入模型和地址参数
-            result = llm_client(
+            # 未配置路由策略时使用 async_llm_client 的默认 Gemini 配置，不再显式传入模型和地址参数；
+            # 异步调用使同一轮中多个依赖任务的参数重生成可以并发进行
+            result = await routed_llm_client(
                 prompt=prompt,
                 query=query,
+                stage=STAGE_PARAM_REGEN,
             )
             
             if isinstance(result, dict):
@@ -553,15 +589,13 @@ class TaskExecutor:
             print(f"=== API 调用后的结果 ===")
             print(f"API 结果: {result}")
                 
-            necessary_fields = ["paper_id", "id", "interests","n_citation", "citation", "name","gender","org","org_name", "org_id","title","_id","authors","abstract","keywords","orgid","venue","year","ai_interests","bio","bio_zh","emails","nation","position","position_zh","work", "h_index"] 
-                
             # 处理结果数据
             if isinstance(result, dict) and result.get("data"):
                 if all(isinstance(item, str) for item in result["data"]):  # 检查所有元素是否都是字符串
                     pass
                 else:
                     result["data"] = [
-                        {key: item[key] for key in necessary_fields if key in item} 
+                        {key: item[key] for key in NECESSARY_FIELDS if key in item} 
                         for item in result["data"]
                     ]
 
@@ -641,6 +675,7 @@ async def main():
     inputs, results = await executor.run()
     print("Execution Results:", results)
     print("Execution Inputs:", inputs)
+    await AMinerAPI.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -26,38 +26,66 @@ API_TOKEN = ""
 API_CONFIG = {
     "search_paper_id": {
         "endpoint": "/gateway/api/v3/paper/search/paper/SearchPro",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 10.0,
+        "retries": 2
     },
     "search_paper_detail": {
         "endpoint": "/gateway/api/v3/paper/detail/batch/order",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 10.0,
+        "retries": 2
     },
     "search_venue_id": {
         "endpoint": "/gateway/api/v3/venue/search/venue/SearchPro",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 5.0,
+        "retries": 2
     },
     "search_venue_detail": {
         "endpoint": "/gateway/api/v3/venue/detail/batch",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 5.0,
+        "retries": 2
     },
     "search_author_id": {
         "endpoint": "/gateway/api/v3/person/search/aminer",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 10.0,
+        "retries": 2
     },
     "search_author_detail": {
         "endpoint": "/gateway/api/v3/person/detail/batch",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 10.0,
+        "retries": 2
     },
     "search_org_id": {
         "endpoint": "/gateway/open_platform/api/organization/search",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 5.0,
+        "retries": 2
     },
     "search_org_detail": {
         "endpoint": "/gateway/api/v3/organization/detail/batch",
-        "method": "POST"
+        "method": "POST",
+        "timeout": 5.0,
+        "retries": 2
     },
 }
 
+# API_CONFIG 各条目未指定时使用的容错配置（resilience.py），条目中可单独覆盖任意一项
+API_RESILIENCE_DEFAULTS = {
+    "timeout": 10.0,  # 单次请求超时（秒）
+    "retries": 2,  # 最多重试次数（仅超时、连接错误、429、5xx）
+    "backoff_base": 0.5,  # 指数退避基数（秒），实际等待在 [0, base * 2^n] 内随机
+    "backoff_max": 8.0,  # 单次退避上限（秒）
+    "failure_threshold": 5,  # 连续失败多少次后熔断
+    "reset_timeout": 30.0,  # 熔断持续时间（秒），之后放行一个探测请求
+    "retry_ratio": 0.2,  # 重试预算：重试量不超过请求量的该比例
+    "retry_budget": 10.0,  # 重试预算上限（允许的突发重试次数）
+}
+
 
 GOOGLE_API_KEY = ""
 BIGDATA_API_KEY = ""
@@ -69,4 +97,112 @@ ARK_MODEL = "deepseek-v3-2-251201"
 
 DEEPSEEK_API_KEY = "" # 官网
 DEEPSEEK_API_BASE = "https://api.deepseek.com/v1"
-DEEPSEEK_MODEL = "deepseek-chat"  # 可选: deepseek-reasoner 等
\ No newline at end of file
+DEEPSEEK_MODEL = "deepseek-chat"  # 可选: deepseek-reasoner 等
+
+# LLM 客户端连接池配置（llm.get_client 按 (base_url, api_key) 复用客户端）
+LLM_MAX_CONNECTIONS = 100  # 每个客户端的最大连接数
+LLM_MAX_KEEPALIVE_CONNECTIONS = 20  # 保持空闲的长连接数
+LLM_KEEPALIVE_EXPIRY = 60.0  # 空闲连接保活时间（秒）
+LLM_TIMEOUT = 600.0  # 单次请求超时（秒）
+
+# LLM 响应缓存配置（SQLite，键为 model + prompt + query + 采样参数的哈希）
+LLM_CACHE_PATH = "cache/llm_cache.sqlite3"
+LLM_CACHE_TTL = 30 * 24 * 3600  # 缓存有效期（秒），None 表示不过期
+LLM_CACHE_MAX_ENTRIES = 200000  # 最大条目数，超出后按最近访问时间淘汰
+LLM_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 最大占用（字节）
+LLM_CACHE_MODE = "read_through"  # read_through / write_only / bypass
+
+# 各服务商限流配置（rate_limit.get_limiter 使用）
+# rps: 每秒请求数；tpm: 每分钟 token 数；max_concurrency: 在途请求上限（AIMD 自适应的上界）
+# latency_target: 单次请求延迟超过该值（秒）时小幅下调并发
+PROVIDER_LIMITS = {
+    "gemini": {"rps": 5, "tpm": 2000000, "max_concurrency": 16, "latency_target": 120.0},
+    "gpt": {"rps": 5, "tpm": 2000000, "max_concurrency": 16, "latency_target": 120.0},
+    "claude": {"rps": 2, "tpm": 400000, "max_concurrency": 8, "latency_target": 120.0},
+    "qwen": {"rps": 5, "tpm": 1000000, "max_concurrency": 16, "latency_target": 120.0},
+    "deepseek": {"rps": 10, "tpm": 1000000, "max_concurrency": 32, "latency_target": 60.0},
+    "ark": {"rps": 10, "tpm": 1000000, "max_concurrency": 32, "latency_target": 60.0},
+    "chatglm": {"rps": 5, "tpm": 1000000, "max_concurrency": 16, "latency_target": 60.0},
+    "default": {"rps": 5, "tpm": None, "max_concurrency": 8, "latency_target": None},
+}
+LLM_RATE_LIMIT_RETRIES = 6  # 遇到 429 时在 LLM 调用层的最大重试次数
+LLM_STREAM_INCLUDE_USAGE = True  # 流式请求是否携带 stream_options.include_usage（服务商不支持时改为 False）
+
+# 多服务商路由配置（router.py）；cost 为相对价格（每百万输入 token，美元），仅用于 cheapest 策略排序
+LLM_PROVIDERS = {
+    "gemini": {"model": GEMINI_MODEL, "api_key": GEMINI_API_KEY, "base_url": GEMINI_API_BASE, "cost": 2.0},
+    "gpt": {"model": GPT_MODEL, "api_key": OPENAI_API_KEY, "base_url": OPENAI_API_BASE, "cost": 1.75},
+    "claude": {"model": CLAUDE_MODEL, "api_key": CLAUDE_API_KEY, "base_url": CLAUDE_API_BASE, "cost": 3.0},
+    "qwen": {"model": QWEN_MODEL, "api_key": QWEN_API_KEY, "base_url": QWEN_API_BASE, "cost": 0.3},
+    "deepseek": {"model": DEEPSEEK_MODEL, "api_key": DEEPSEEK_API_KEY, "base_url": DEEPSEEK_API_BASE, "cost": 0.28},
+    "ark": {"model": ARK_MODEL, "api_key": ARK_API_KEY, "base_url": ARK_API_BASE, "cost": 0.28},
+}
+LLM_ROUTE_POLICY = None  # None 表示各调用点使用固定模型；可选 cheapest / fastest / round_robin
+LLM_ROUTE_PROVIDERS = None  # 参与路由的服务商名称列表，None 表示 LLM_PROVIDERS 全部
+LLM_HEDGE_PERCENTILE = 95  # 主请求耗时超过该分位数时向第二个服务商发起对冲请求
+LLM_HEDGE_DEFAULT_DELAY = 60.0  # 延迟样本不足时的对冲等待时间（秒）
+LLM_TOKEN_BUDGET = None  # 单次运行的 LLM token 上限（process_questions），None 表示不限制
+
+# 录制/回放配置（replay.py）：record 模式把 LLM 与工具调用的请求和响应写入夹具文件，
+# replay 模式从夹具文件返回结果并模拟延迟，用于无网络环境下的确定性压测
+REPLAY_MODE = "off"  # off / record / replay
+REPLAY_FIXTURE_PATH = "fixtures/replay.jsonl"
+REPLAY_LATENCY = {  # 回放时各类调用的模拟延迟（秒）
+    "llm": 3.0,
+    "aminer": 0.3,
+    "custom_server": 0.5,
+    "google": 2.0,
+    "aminer_search": 1.0,
+}
+REPLAY_LATENCY_JITTER = 0.2  # 模拟延迟的随机抖动比例（±20%）
+
+# AMiner datacenter 连接池配置（api.AMinerAPI 在进程内共享一个长连接客户端）
+AMINER_BASE_URL = "https://datacenter.aminer.cn"
+AMINER_HTTP_MAX_CONNECTIONS = 100  # 最大连接数
+AMINER_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20  # 保持空闲的长连接数
+AMINER_HTTP_KEEPALIVE_EXPIRY = 30.0  # 空闲连接保活时间（秒）
+AMINER_HTTP2 = True  # 启用 HTTP/2 多路复用（需安装 h2，未安装时自动退回 HTTP/1.1）
+
+# 自定义工具服务器（tools.CUSTOM_SERVER_BASE）连接池与超时配置
+CUSTOM_SERVER_MAX_CONNECTIONS = 100  # 最大连接数
+CUSTOM_SERVER_MAX_KEEPALIVE_CONNECTIONS = 50  # 保持空闲的长连接数
+CUSTOM_SERVER_MAX_CONCURRENCY = 64  # 同时在途的请求上限，超出的调用排队等待
+CUSTOM_SERVER_DEFAULT_TIMEOUT = 30.0  # 默认超时（秒）
+CUSTOM_SERVER_TIMEOUTS = {  # 各接口单独的超时（秒）
+    "search_paper_id": 30.0,
+    "search_paper_detail": 20.0,
+    "search_author_id": 30.0,
+    "search_author_detail": 20.0,
+    "search_venue_id": 15.0,
+    "search_venue_detail": 15.0,
+    "search_org_id": 15.0,
+    "search_org_detail": 15.0,
+}
+
+# 详情查询微批（detail_batcher.py）：同类详情查询在时间窗口内合并为一次批量请求
+DETAIL_BATCH_WINDOW = 0.02  # 收集窗口（秒），窗口内到达的 ID 去重后合并请求
+DETAIL_BATCH_MAX_IDS = 100  # 单次批量请求的 ID 上限，攒满立即发出
+
+# 实体详情缓存（entity_cache.py）：paper / author / venue / org 详情按类型和 ID 缓存，跨问题复用
+ENTITY_CACHE_MAX_ENTRIES = 20000  # 内存中最多缓存的实体数，超出按 LRU 淘汰
+ENTITY_CACHE_TTL = 7 * 24 * 3600  # 过期时间（秒），None 表示不过期
+ENTITY_CACHE_PATH = None  # 磁盘缓存路径（如 "cache/entity_cache.sqlite3"），None 表示只用内存
+
+# 检索结果缓存（search_cache.py）：search_*_id 的参数规范化后作为键，相同检索直接走本地
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_PATH = "cache/search_cache.sqlite3"
+SEARCH_CACHE_TTL = 24 * 3600  # 有结果时的过期时间（秒）
+SEARCH_CACHE_NEGATIVE_TTL = 600  # 空结果的过期时间（秒），0 表示不缓存空结果
+SEARCH_CACHE_MAX_ENTRIES = 50000  # 最大条目数，超出按 LRU 淘汰
+
+# 谷歌学术路径中按标题查 AMiner 论文（new_tool.search_paper_title_via_aminer_async）
+AMINER_SEARCH_URL = "https://searchtest.aminer.cn/aminer-search/search/publication"
+AMINER_SEARCH_MAX_CONNECTIONS = 20  # 共享连接池的最大连接数
+AMINER_SEARCH_MAX_CONCURRENCY = 8  # 同时在途的标题查询上限
+AMINER_SEARCH_TITLE_TIMEOUT = 10.0  # 单个标题的截止时间（秒，含排队），超时即取消并按未找到处理
+
+# Google Scholar（SerpApi）结果缓存（google_search.google_search_tool），键为规范化后的查询
+GOOGLE_CACHE_PATH = "cache/google_cache.sqlite3"
+GOOGLE_CACHE_TTL = 7 * 24 * 3600  # 成功结果的过期时间（秒）
+GOOGLE_CACHE_FAILURE_TTL = 300  # 调用失败的缓存时间（秒），期间相同查询直接返回空结果，0 表示不缓存失败
+GOOGLE_CACHE_MAX_ENTRIES = 20000  # 最大条目数，超出按 LRU 淘汰
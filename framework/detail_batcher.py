@@ -0,0 +1,232 @@
+import asyncio
+import weakref
+
+from config import DETAIL_BATCH_WINDOW, DETAIL_BATCH_MAX_IDS
+from tools import search_paper_detail_tool, search_author_detail_tool, search_venue_detail_tool, \
+    search_org_detail_tool
+from api import AMinerAPI
+from entity_cache import entity_cache
+from projection import fields_tag
+
+# 详情条目中可能表示 ID 的字段，按顺序取第一个非空值
+ID_FIELDS = ("id", "_id", "paper_id", "author_id", "venue_id", "org_id")
+
+# 各类详情查询的批量请求函数：接收去重后的 ID 列表和字段投影，返回批量接口的原始响应
+DETAIL_FETCHERS = {
+    "search_paper_detail": lambda ids, fields: search_paper_detail_tool(paper_ids=ids, fields=fields),
+    "search_author_detail": lambda ids, fields: search_author_detail_tool(author_ids=ids, fields=fields),
+    "search_venue_detail": lambda ids, fields: search_venue_detail_tool(venue_ids=ids, fields=fields),
+    "search_org_detail": lambda ids, fields: search_org_detail_tool(org_ids=ids, fields=fields),
+    # datacenter 的批量接口（TaskExecutor 中 venue / org 详情走 AMinerAPI）
+    "aminer:search_venue_detail": lambda ids, fields: AMinerAPI().call_api("search_venue_detail", {"ids": ids}, fields),
+    "aminer:search_org_detail": lambda ids, fields: AMinerAPI().call_api("search_org_detail", {"ids": ids}, fields),
+}
+
+
+def _item_id(item):
+    if isinstance(item, dict):
+        for field in ID_FIELDS:
+            value = item.get(field)
+            if value:
+                return str(value)
+    return None
+
+
+def _scatter(ids, response):
+    """把批量响应按 ID 拆开，返回 (公共字段, {id: 条目})；响应无法拆分时返回 None"""
+    if not isinstance(response, dict) or not isinstance(response.get("data"), list):
+        return None
+    items = response["data"]
+    by_id = {}
+    for item in items:
+        item_id = _item_id(item)
+        if item_id is not None:
+            by_id.setdefault(item_id, item)
+    if not by_id and items:
+        if len(items) != len(ids):
+            return None
+        # 条目不带 ID 字段时按请求顺序对应（batch/order 接口保证顺序）
+        by_id = dict(zip(ids, items))
+    meta = {k: v for k, v in response.items() if k != "data"}
+    return meta, by_id
+
+
+def _assemble(ids, items, meta):
+    """把各 ID 的详情按调用方请求的顺序拼回一个响应"""
+    response = dict(meta or {})
+    data = [items[id_] for id_ in ids if id_ in items]
+    response["data"] = data
+    if "total" in response:
+        response["total"] = len(data)
+    return response
+
+
+class DetailBatcher:
+    """
+    单个事件循环内某一类详情查询的微批器：
+    - window 秒内到达的查询合并，ID 去重后发一次批量请求，攒满 max_ids 个立即发出
+    - 已在途的 ID 直接等待在途请求的结果，不重复请求
+    - 响应按 ID 拆分后分发给各调用方，每个调用方只拿到自己请求的条目
+    """
+
+    def __init__(self, fetch, window=DETAIL_BATCH_WINDOW, max_ids=DETAIL_BATCH_MAX_IDS):
+        self.fetch = fetch
+        self.window = window
+        self.max_ids = max_ids
+        self.calls = 0
+        self.batches = 0
+        self.ids_requested = 0
+        self.ids_fetched = 0
+        self._pending = {}
+        self._inflight = {}
+        self._timer = None
+        # 在途批量请求的 task（事件循环只弱引用 task，这里持有强引用防止被回收）
+        self._tasks = set()
+
+    async def get(self, ids):
+        """返回与 ids 一一对应的 (公共字段, 详情, 是否可拆分)；不可拆分时公共字段为原始响应"""
+        loop = asyncio.get_running_loop()
+        ids = [str(i) for i in ids]
+        self.calls += 1
+        self.ids_requested += len(ids)
+        futures = []
+        for id_ in ids:
+            future = self._pending.get(id_) or self._inflight.get(id_)
+            if future is None:
+                future = self._pending[id_] = loop.create_future()
+            futures.append(future)
+        if len(self._pending) >= self.max_ids:
+            self._flush()
+        elif self._pending and self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        # shield：某个调用方被取消时不影响共享同一批请求的其他调用方
+        return await asyncio.gather(*(asyncio.shield(f) for f in futures))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self._inflight.update(batch)
+        ids = list(batch)
+        for start in range(0, len(ids), self.max_ids):
+            task = asyncio.ensure_future(self._run(ids[start:start + self.max_ids], batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, ids, batch):
+        self.batches += 1
+        self.ids_fetched += len(ids)
+        try:
+            response = await self.fetch(ids)
+        except Exception as e:
+            for id_ in ids:
+                if not batch[id_].done():
+                    batch[id_].set_exception(e)
+            return
+        except BaseException:
+            # 批量请求被取消（如关闭时），等待者随之取消而不是一直挂起
+            for id_ in ids:
+                batch[id_].cancel()
+            raise
+        finally:
+            for id_ in ids:
+                if self._inflight.get(id_) is batch[id_]:
+                    del self._inflight[id_]
+
+        scattered = _scatter(ids, response)
+        for id_ in ids:
+            future = batch[id_]
+            if future.done():
+                continue
+            if scattered is None:
+                future.set_result((response, None, False))
+            else:
+                meta, by_id = scattered
+                future.set_result((meta, by_id.get(id_), True))
+
+    async def close(self):
+        """取消尚未发出和在途的批量请求，并等待其结束"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending = {}
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "ids_requested": self.ids_requested,
+            "ids_fetched": self.ids_fetched,
+        }
+
+
+# 批量 future 绑定事件循环，每个事件循环一组微批器（process_questions 每批次一个 asyncio.run）
+_BATCHERS = weakref.WeakKeyDictionary()
+
+
+def get_batcher(kind, fields=None):
+    """同一类查询的不同字段投影分别合并（投影不同，返回的条目不能共用）"""
+    loop = asyncio.get_running_loop()
+    batchers = _BATCHERS.setdefault(loop, {})
+    name = kind + fields_tag(fields)
+    batcher = batchers.get(name)
+    if batcher is None:
+        fetch = DETAIL_FETCHERS[kind]
+        batcher = batchers[name] = DetailBatcher(lambda ids: fetch(ids, fields))
+    return batcher
+
+
+async def fetch_details(kind, ids, fields=None):
+    """
+    带缓存、合并批量的详情查询，kind 为 DETAIL_FETCHERS 的键
+    先查实体缓存，只有未命中的 ID 进入微批请求；fields 为字段投影（自动保留 ID 字段），
+    缓存按投影分开存放；
+    返回格式与对应批量接口相同，data 中只包含本次请求的 ID（按请求顺序）
+    """
+    if fields:
+        fields = sorted(set(fields) | set(ID_FIELDS))
+    if not ids or not isinstance(ids, list):
+        # 空 ID 或格式不对时直接请求，保持接口原有的报错行为
+        return await DETAIL_FETCHERS[kind](ids, fields)
+    namespace = kind + fields_tag(fields)
+    ids = [str(i) for i in ids]
+    items = entity_cache.get_many(namespace, ids)
+    misses = [id_ for id_ in dict.fromkeys(ids) if id_ not in items]
+    meta = None
+    if misses:
+        fetched = {}
+        for id_, (meta, item, ok) in zip(misses, await get_batcher(kind, fields).get(misses)):
+            if not ok:
+                # 批量响应无法拆分（出错或格式未知），原样返回且不缓存
+                return meta
+            if item is not None:
+                fetched[id_] = item
+        entity_cache.set_many(namespace, fetched)
+        entity_cache.set_meta(namespace, meta)
+        items.update(fetched)
+    else:
+        meta = entity_cache.get_meta(namespace)
+    return _assemble(ids, items, meta)
+
+
+async def close_batchers():
+    """关闭当前事件循环中的所有微批器（在事件循环结束前调用）"""
+    batchers = _BATCHERS.pop(asyncio.get_running_loop(), {})
+    await asyncio.gather(*(batcher.close() for batcher in batchers.values()))
+
+
+def batcher_stats():
+    try:
+        batchers = _BATCHERS.get(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        batchers = {}
+    return {kind: batcher.stats() for kind, batcher in batchers.items()}
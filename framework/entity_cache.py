@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+from cache import DiskCache
+from config import ENTITY_CACHE_MAX_ENTRIES, ENTITY_CACHE_TTL, ENTITY_CACHE_PATH
+
+# 每类实体最近一次批量响应的公共字段（code / msg 等）在缓存中的 ID
+META_ID = "__meta__"
+
+
+class EntityCache:
+    """
+    实体详情缓存，键为 (实体类型, ID)
+
+    - 内存部分为 LRU + TTL，最多 max_entries 条
+    - 指定 path 时以 DiskCache 作为二级缓存，内存未命中再查磁盘，命中后回填内存
+    """
+
+    def __init__(self, max_entries=ENTITY_CACHE_MAX_ENTRIES, ttl=ENTITY_CACHE_TTL, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = DiskCache(path, ttl=ttl) if path else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, now):
+        entry = self._items.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires is None or expires > now:
+                self._items.move_to_end(key)
+                return value
+            del self._items[key]
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self._put(key, value, now)
+                return value
+        return None
+
+    def _put(self, key, value, now):
+        self._items[key] = (now + self.ttl if self.ttl is not None else None, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, kind, ids):
+        """返回 {id: 详情}，只包含命中的 ID"""
+        now = time.time()
+        found = {}
+        with self._lock:
+            for id_ in ids:
+                if id_ in found:
+                    continue
+                value = self._get(f"{kind}:{id_}", now)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[id_] = value
+        return found
+
+    def set_many(self, kind, items):
+        now = time.time()
+        with self._lock:
+            for id_, value in items.items():
+                self._put(f"{kind}:{id_}", value, now)
+        if self.disk is not None:
+            for id_, value in items.items():
+                self.disk.set(f"{kind}:{id_}", value)
+
+    def get_meta(self, kind):
+        with self._lock:
+            return self._get(f"{kind}:{META_ID}", time.time())
+
+    def set_meta(self, kind, meta):
+        self.set_many(kind, {META_ID: meta})
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._items),
+        }
+
+
+entity_cache = EntityCache(path=ENTITY_CACHE_PATH)
@@ -4,7 +4,9 @@ import numpy as np
 from tqdm import tqdm
 from collections import defaultdict
 from statistics import mean
-from openai import OpenAI
+
+from llm import chat_completion
+from accounting import ledger, usage_path_for
 
 # ========== 配置区域 ==========
 # 若使用代理或本地部署模型可修改
@@ -66,18 +68,20 @@ def _extract_rating_json(text: str):
     return None
 
 
-def llm_score(prompt: str) -> float:
-    """通用LLM打分函数，返回 0~1 之间的浮点数"""
-    client = OpenAI(api_key=API_KEY, base_url=API_BASE)
+def llm_score(prompt: str, stage: str = "judge") -> float:
+    """通用LLM打分函数，返回 0~1 之间的浮点数；stage 为用量统计的阶段标签，如 judge-correctness"""
     content = None
     raw = None
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
+        content = chat_completion(
             messages=[{"role": "user", "content": prompt}],
+            model=MODEL_NAME,
+            api_key=API_KEY,
+            base_url=API_BASE,
+            stage=stage,
             temperature=0.3
         )
-        content = (response.choices[0].message.content or "").strip()
+        content = (content or "").strip()
         if not content:
             print("⚠️ 评分出错：模型返回为空")
             return 0.0
@@ -395,13 +399,13 @@ def main():
             gold_item.get("planning_text", [])
         )
 
-        correctness = llm_score(make_prompt_correctness(question, gold_ans, pred_ans))
-        integrality = llm_score(make_prompt_integrality(question, gold_ans, pred_ans))
-        completeness = llm_score(make_prompt_completeness(question, pred_ans, gold_ans))
+        correctness = llm_score(make_prompt_correctness(question, gold_ans, pred_ans), stage="judge-correctness")
+        integrality = llm_score(make_prompt_integrality(question, gold_ans, pred_ans), stage="judge-integrality")
+        completeness = llm_score(make_prompt_completeness(question, pred_ans, gold_ans), stage="judge-completeness")
         
         execution_result = pred_item.get("execution_result", [])
         api_output = execution_result[-1] if execution_result else {}
-        faithfulness = llm_score(make_prompt_faithfulness(pred_ans, api_output))
+        faithfulness = llm_score(make_prompt_faithfulness(pred_ans, api_output), stage="judge-faithfulness")
 
         eval_result = {
             "qid": qid,
@@ -427,6 +431,10 @@ def main():
     with open(OUTPUT_METRICS, "w", encoding="utf-8") as f:
         json.dump(average, f, indent=2)
 
+    usage_file = usage_path_for(OUTPUT_JSON)
+    ledger.write(usage_file)
+    print(f"评测 LLM 用量已保存至 {usage_file}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
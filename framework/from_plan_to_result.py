@@ -6,275 +6,22 @@ import asyncio
 import time
 from typing import List, Dict
 
-from llm import llm_client
-from config import OPENAI_API_KEY, OPENAI_API_BASE, GPT_MODEL
+from llm import async_llm_stream, close_async_clients, set_cache_mode, llm_cache, inflight_stats
+from rate_limit import limiter_stats
+from router import routed_llm_client, get_router
+from config import OPENAI_API_KEY, OPENAI_API_BASE, GPT_MODEL, LLM_TOKEN_BUDGET
+from accounting import ledger, usage_path_for, STAGE_PLAN, STAGE_SUMMARY
+from replay import set_replay_mode
 from caller import TaskExecutor
-
-RESULT_PROMPT = """
-You are a world-class academic expert. You will answer questions from any academic field.
-
-Instructions:
-
-Your answer must be in the same language as the question. 
-
-The answer must be concise and scholarly, no longer than 300 words.
-
-Analyze the user's question to determine the underlying intent(s). For each distinct intent, provide a separate, clearly labeled point in your answer.
-
-Use the following knowledge base information (api_output) as your primary source. Only use data from the knowledge base that is directly relevant to the question and its intent(s). Do not use unrelated information, even if present in the knowledge base.
-
-If your answer contains any information drawn from api_output (even partially), you must include a citation [e.g., [1], [2]] for that content. If the information is insufficient, you may supplement with your own knowledge, but always prioritize and cite api_output when used.
-In the "reference" field, each citation label (e.g., [1], [2]) should map to a full citation (with the appropriate link, as specified above).
-In the "reference" field, only use links or IDs that are present in the knowledge base (api_output); do not invent, infer, or fabricate any links or IDs.
-In the "reference" field, citations must be numbered sequentially as [1], [2], [3], [4], etc., starting from [1] and increasing by 1 for each new citation. No duplicate citations are allowed in the "reference" field; each cited item should appear only once in the reference list.
-
-If a citation is an ID, determine its type (paper, author, venue, or org) based on the knowledge base (api_output), and generate the corresponding full URL as follows:
-- For papers: https://www.aminer.cn/pub/paper_id
-- For scholars: https://www.aminer.cn/profile/author_id
-- For journals/conferences: https://www.aminer.cn/open/journal/detail/venue_id
-- For institutions: https://www.aminer.cn/institution/org_id
-Only generate such URLs if the ID exists in the knowledge base (api_output); do not fabricate or infer IDs.
-
-Output only a JSON object with two fields:
-- "answer": your academic answer, written in the same language as the question (max 300 words).
-- "reference": a dictionary mapping each citation label to its bibliographic citation (as a webpage or ID from the knowledge base).
-
-Example output:
-{{
-"answer": "Your detailed answer here, with inline citations [1][2] ...",
-"reference": {{"[1]": "https://xxx", "[2]": "ID"}}
-}}
-
-Here is the knowledge base output (api_output):
-{api_output}
-
-Here is the question:
-{question}
-"""
-
-PLAN_PROMPT = """你是一个规划专家，你将根据用户的问题，选择一个或多个合适的API，使用API检索到相关信息，从而可以准确回答用户的问题。【thinking过程不要超过十句话】
-   你生成的格式示例如下：
-    [
-        {
-            "name": "search_author_id",
-            "rely": [],
-            "order": 1,
-            "params": {"interest": ["Optical communication"]}
-        },
-        {
-            "name": "search_author_detail",
-            "rely": ["search_author_id"],
-            "order": 2,
-            "params": {"ids": []}
-        },
-    ]
-    # 说明：其中，name指的是API的名称，rely是输入参数的来源API名称，只能为api名称，order指的是执行的顺序，如1，2，3；params是API的参数
-    # 注意：你不需要生成额外的任何解释，只需要生成上面说明生成json内容即可！（不需要出现```、json等字眼）
-    # 注意：如果参数没有具体值，则用""空字符、或者空list，或其他空的值
-    # 注意：true和false必须首字母小写！
-    # 注意：没有指定排序方式的情况下，都按照citation排序！
-    # 注意：如果有多个相同名字的api，则在name中加编号，如search_paper_id(1)、search_paper_id(2)等
-    # 注意：如果问题没有指定为中文，关键词一律使用英文单词！
-
-    # 注意：你不要局限于上面的规划顺序，你可以按照你的知识给出任何的api调用顺序！
-
-    # 可用的API如下：
-【search_paper_id】
-    "search_paper_id": {
-        "description": "根据条件搜索论文ID",
-        "parameters": {
-            "titles": ["论文标题"], 
-            "keywords": ["关键词"], 
-            "years": {
-                "type": "array",
-                "description": "发表年份列表, 年份用整数表示"
-            },
-            "is_sci": {
-                "type": "boolean",
-                "description": "是否为SCI论文"
-            },
-            "language": "论文语言(str), 使用ISO 639-1标准如'en', 'zh'",
-            "sort": "排序方式(str)，只能选择: year, citation",
-            "author": "作者姓名(str)",
-            "author_id": "作者ID(str)",
-            "coauthors": {
-                "type": "array",
-                "description": "共同作者姓名列表，指的是不包括author参数作者的其他作者"
-            },
-            "org": "机构或学校名称(str)",
-            "org_id": "机构或学校ID(str)",
-            "venues": {
-                "type": "array",
-                "description": "期刊或会议列表，使用英文小写缩写，不需要带年份"            
-            },
-            "venue_ids": ["期刊或会议ID"], 
-            "size": {
-                "type": "integer",
-                "description": "返回结果数量，必须小于100"                   
-            }
-        },
-        "response": {
-            "description": "返回结果列表, 每个元素为一个字典(代表一篇论文)",
-            "data": [
-                {
-                    "paper_id": "论文ID(str)",
-                    "title": "论文标题(str)"
-                }
-            ]
-        }                     
-    },
-
----
-【search_paper_detail】
-    "search_paper_detail":{
-        "description": "根据论文ID列表，获取论文详细信息",
-        "parameters": {
-            "paper_ids": ["论文ID"]
-        },
-        "response":{
-            "description": "返回结果列表, 每个元素为一个字典(代表一篇论文)",
-            "data": [
-                {
-                    "paper_id": "论文ID(str)",
-                    "title": "论文标题(str)",
-                    "abstract": "论文摘要(str)",
-                    "year": "发表年份(float)",
-                    "citation": "被引用次数(float)",
-                    "keywords": ["关键词"],
-                    "authors": [
-                        {
-                            "author": "作者姓名(str)",
-                            "author_id": "作者ID(str)",
-                            "org": "作者机构(str)",
-                            "org_id": "作者机构ID(str)",
-                            "email":"作者邮箱(str)"
-                        }
-                    ],
-                    "org": "发表机构(str)",
-                    "org_id": "发表机构ID(str)",    
-                    "venue": "发表的期刊或会议(str)"
-                }
-            ]
-        }
-    },
-
----
-【search_author_id】
-    {
-        "type": "function",
-        "function":{
-            "name": "search_author_id",
-            "description": "根据姓名、机构、兴趣、国家等条件搜索学者",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "学者姓名",
-                    },
-                    "org": {
-                        "type": "string",
-                        "description": "学者所在机构",
-                    },
-                    "size": {
-                        "type": "integer",
-                        "description": "返回的学者数量，最大为1000",
-                    },
-                    "interest": {
-                        "type": "list",
-                        "description": "学者兴趣，格式为[str,str,...]"
-                    },
-                    "nation": {
-                        "type": "list",
-                        "description": "学者所在国家，格式为[str,str,...]
-                    },
-                    "order": {
-                        "type": "string",
-                        "description": "排序字段名 n_citation, n_pubs, h_index"
-                    },
-                    "asc": {
-                        "type": "boolean",
-                        "description": "true 升序 false 降序"
-                    }
-                },
-                "required": []
-            }
-        }
-    },
----
-【search_author_detail】根据学者ID列表获取学者详情
-输入：ids：[str,str, ...]  #id列表
-
----
-【search_venue_id】根据期刊名称搜索期刊ID、期刊标准名称
-输入： 
-    name：str  #期刊名称
-    category：str  #学科分类名称
-    category_source:string # 使用数字形式字符串，不同的数字的含义如下： 0: "SJR", 1: "WOS", 2: "GB09", 3: "CCF", 4: "CSCD", 5: "CCJ", 6: "ARXIV", 7: "CJCR", 8: "JCR", 9: "SCI"
-    quartile：str  #期刊分区搜索 如"1区", "A", "Q1"
-    keywords：list  #期刊关键词列表
-    size：number  #返回的期刊数量
-输出：期刊id
-
----
-【search_venue_detail】根据期刊ID获取期刊详情
-输入：
-    ids：[str,str, ...]  #id列表
-输出：
-alias	array	别名
-category_id	string	学科领域id
-classes	array	数据源
-id	string	id
-issn	string	ISSN
-lower_alias	array	别名（小写）
-name	string	姓名
-name_en	string	机构英文名称
-name_zh	string	中文名
-num	float	优先权号
-quartile	string	分区
-source_quartiles	array	源分区
-total	float	总数
-type	string	分类体系
-url	string	来源url    
-
----
-【search_org_id】根据名称关键词搜索机构ID、名称
-输入：
-    orgs：[str,str,...]  #机构名称列表
-输出：
-    机构id列表
-
----
-【search_org_detail】通过机构ID获取机构详情
-输入：  
-    ids：[str,str, ...]  #id列表
-输出：
-acronyms	array	
-aliases	array	机构别名
-coordinate	array	
-details	array	机构详情
-error	array	
-established	int	成立时间
-external_ids	array	
-geographic_id	string	地理id
-id	string	机构id
-image	string	图片
-introduction	string	简介
-language	string	语言
-latitude	float	纬度
-longitude	float	经度
-name	string	机构名称
-name_en	string	机构英文名称
-name_zh	string	中文名
-relationships	array	
-src	string	数据源
-total	int	返回数据条数
-type	string	机构类型
-
-【search_paper_id_gs】借助谷歌学术搜索得到论文id
-输入：  
-    query: "str" # 用户问题
-"""
+from api import AMinerAPI
+from tools import close_custom_server_client
+from new_tool import close_title_search_client
+from google_search import google_cache
+from detail_batcher import batcher_stats, close_batchers
+from entity_cache import entity_cache
+from search_cache import search_cache
+from resilience import endpoint_stats
+from prompt_assembly import build_plan_prompt, build_summary_prompt, format_prompt_usage
 
 
 def _repair_json_trailing_comma(s: str) -> str:
@@ -350,7 +97,10 @@ def _parse_plan_response(plan):
 
 
 # 单个问题的处理逻辑（带重试）
-async def process_single_question(item: Dict, idx: int) -> Dict:
+async def process_single_question(item: Dict, idx: int, on_summary_delta=None) -> Dict:
+    """
+    on_summary_delta: 可选回调，总结阶段每收到一段增量文本即调用一次，用于交互场景下实时展示部分答案
+    """
     question = item.get("question", "").strip()
     question_id = item.get("id", idx + 1)
     if not question:
@@ -362,32 +112,58 @@ async def process_single_question(item: Dict, idx: int) -> Dict:
             print(f"\n===== 处理问题 {idx+1}（尝试 {attempt+1}/{max_retries}）=====")
             print("问题内容：", question)
 
-            plan_prompt = PLAN_PROMPT + "用户问题如下：" + question
-            # 使用 GPT（云雾 API）
-            plan = llm_client(
+            # PLAN_PROMPT 作为固定的 system 前缀，问题只放在 user 消息中，便于服务商前缀缓存复用
+            plan_prompt, plan_query = build_plan_prompt(question)
+            plan_usage = {}
+            # 默认使用 GPT（云雾 API）；配置 LLM_ROUTE_POLICY 后由路由器选择服务商
+            plan = await routed_llm_client(
                 prompt=plan_prompt,
-                query=question,
+                query=plan_query,
                 model=GPT_MODEL,
                 api_key=OPENAI_API_KEY,
                 base_url=OPENAI_API_BASE,
+                usage=plan_usage,
+                stage=STAGE_PLAN,
             )
             print("【规划】\n", plan)
+            print("【规划用量】", format_prompt_usage(plan_usage))
+            # async_llm_client 出错时返回 {"error": ...}（429 已在限流层重试过），转为异常交给下面的重试逻辑
+            if isinstance(plan, dict) and "error" in plan:
+                raise RuntimeError(plan["error"])
 
             plan_obj = _parse_plan_response(plan)
             executor = TaskExecutor(plan_obj)
             result = await executor.run()
             print("【执行结果】\n", result)
 
-            summary_prompt = RESULT_PROMPT.format(api_output=result, question=question)
-            summary = llm_client(
-                prompt=summary_prompt,
-                query=question,
-                model=GPT_MODEL,
-                api_key=OPENAI_API_KEY,
-                base_url=OPENAI_API_BASE,
-            )
+            # RESULT_PROMPT 作为固定的 system 前缀，API 输出和问题放在 user 消息末尾
+            summary_prompt, summary_query = build_summary_prompt(api_output=result, question=question)
+            if get_router() is not None:
+                # 路由模式下走对冲请求，不做流式输出
+                summary_usage = {}
+                summary = await routed_llm_client(prompt=summary_prompt, query=summary_query, usage=summary_usage, stage=STAGE_SUMMARY)
+                if isinstance(summary, dict) and "error" in summary:
+                    raise RuntimeError(summary["error"])
+                if on_summary_delta is not None:
+                    on_summary_delta(summary)
+            else:
+                summary_stream = async_llm_stream(
+                    prompt=summary_prompt,
+                    query=summary_query,
+                    model=GPT_MODEL,
+                    api_key=OPENAI_API_KEY,
+                    base_url=OPENAI_API_BASE,
+                    stage=STAGE_SUMMARY,
+                )
+                async for delta in summary_stream:
+                    if on_summary_delta is not None:
+                        on_summary_delta(delta)
+                summary = summary_stream.text
+                summary_usage = summary_stream.stats
+                print("【总结耗时】", summary_stream.stats)
             
             print("【总结】\n", summary)
+            print("【总结用量】", format_prompt_usage(summary_usage))
 
             return {
                 "id": question_id,
@@ -406,29 +182,36 @@ async def process_single_question(item: Dict, idx: int) -> Dict:
                 "请求过多", "超出限制", "exceeded", "limit"
             ])
             
-            if is_concurrency_error:
-                print(f"⚠️ 检测到 API 并发错误，跳过重试")
-                return {
-                    "id": question_id,
-                    "question": question,
-                    "error": error_msg,
-                    "error_type": "concurrency_error"
-                }
-            
+            # 限流已由 rate_limit 在 LLM 调用层处理（令牌桶 + AIMD 并发控制 + 429 退避重试），
+            # 仍然出现并发错误说明服务商持续过载，退避更久后整题重试，而不是直接放弃该问题
             if attempt < max_retries - 1:
-                wait_time = 2 ** attempt
+                wait_time = 2 ** attempt * (10 if is_concurrency_error else 1)
                 print(f"⏳ 指数退避等待 {wait_time} 秒后重试...")
-                time.sleep(wait_time)
+                await asyncio.sleep(wait_time)
                 continue
             else:
-                return {
+                failed = {
                     "id": question_id,
                     "question": question,
                     "error": error_msg
                 }
+                if is_concurrency_error:
+                    failed["error_type"] = "concurrency_error"
+                return failed
+
+
+def _budget_exhausted(token_budget) -> bool:
+    """本次运行累计的 LLM token 是否已达到上限（token_budget 为 None 表示不限制）"""
+    if token_budget is None:
+        return False
+    used = ledger.total_tokens()
+    if used >= token_budget:
+        print(f"💰 LLM token 用量 {used} 已达到上限 {token_budget}，停止处理后续问题")
+        return True
+    return False
 
 
-async def process_question_batch(batch: List[Dict], batch_idx: int, start_idx: int, output_dir: str, output_file: str) -> List[Dict]:
+async def process_question_batch(batch: List[Dict], batch_idx: int, start_idx: int, output_dir: str, output_file: str, token_budget: int = None) -> List[Dict]:
     results = []
     
     if os.path.exists(output_file):
@@ -438,7 +221,12 @@ async def process_question_batch(batch: List[Dict], batch_idx: int, start_idx: i
             except json.JSONDecodeError:
                 results = []
     
+    # 预热 AMiner 共享连接池，本批次所有问题复用
+    await AMinerAPI.startup()
+
     for i, item in enumerate(batch):
+        if _budget_exhausted(token_budget):
+            break
         result = await process_single_question(item, start_idx + i)
         if result is not None:
             results.append(result)
@@ -448,7 +236,16 @@ async def process_question_batch(batch: List[Dict], batch_idx: int, start_idx: i
         
         if i < len(batch) - 1:
             print(f"⏳ 等待 5 秒后处理下一个问题...")
-            time.sleep(5)
+            await asyncio.sleep(5)
+
+    print(f"🧺 详情查询合并统计: {batcher_stats()}")
+    # 关闭本批次事件循环中的微批器，以及 LLM 与 AMiner 长连接
+    await close_batchers()
+    await close_async_clients()
+    await AMinerAPI.shutdown()
+    await close_custom_server_client()
+    await close_title_search_client()
+    ledger.write(usage_path_for(output_file))
 
     batch_output_file = os.path.join(output_dir, f"output_batch_{batch_idx}.json")
     with open(batch_output_file, 'w', encoding='utf-8') as f:
@@ -458,7 +255,17 @@ async def process_question_batch(batch: List[Dict], batch_idx: int, start_idx: i
     return results
 
 
-def process_questions(input_file: str, output_file: str, batch_size: int = 5):
+def process_questions(input_file: str, output_file: str, batch_size: int = 5, cache_mode: str = None, token_budget: int = LLM_TOKEN_BUDGET, replay_mode: str = None):
+    # cache_mode: LLM 缓存模式 read_through / write_only / bypass，None 时使用 config.LLM_CACHE_MODE
+    # token_budget: 本次运行的 LLM token 上限，达到后不再处理新的问题，None 表示不限制
+    # replay_mode: off / record / replay，None 时使用 config.REPLAY_MODE；
+    #   压测回放时建议同时使用 cache_mode="bypass"，避免本地响应缓存掩盖模拟延迟
+    if cache_mode is not None:
+        set_cache_mode(cache_mode)
+    if replay_mode is not None:
+        set_replay_mode(replay_mode)
+    ledger.reset()
+
     output_dir = "glm-batch_outputs"
     os.makedirs(output_dir, exist_ok=True)
 
@@ -469,12 +276,14 @@ def process_questions(input_file: str, output_file: str, batch_size: int = 5):
     total_batches = (len(questions) + batch_size - 1) // batch_size
 
     for batch_idx in range(total_batches):
+        if _budget_exhausted(token_budget):
+            break
         start = batch_idx * batch_size
         end = min(start + batch_size, len(questions))
         batch = questions[start:end]
         print(f"\n===== 开始处理第 {batch_idx} 批，共 {len(batch)} 个问题 =====")
 
-        batch_results = asyncio.run(process_question_batch(batch, batch_idx, start_idx=start, output_dir=output_dir, output_file=output_file))
+        batch_results = asyncio.run(process_question_batch(batch, batch_idx, start_idx=start, output_dir=output_dir, output_file=output_file, token_budget=token_budget))
         all_results.extend(batch_results)
         
         if batch_idx < total_batches - 1:
@@ -482,6 +291,18 @@ def process_questions(input_file: str, output_file: str, batch_size: int = 5):
             time.sleep(10)
 
     print(f"\n🎉 所有批次处理完成，最终结果已保存至 {output_file}")
+    print(f"📦 LLM 缓存统计: {llm_cache.stats()}")
+    print(f"🚦 LLM 限流统计: {limiter_stats()}")
+    print(f"🔗 LLM 请求合并统计: {inflight_stats()}")
+    print(f"🗂️ 实体详情缓存统计: {entity_cache.stats()}")
+    print(f"🔎 检索结果缓存统计: {search_cache.stats()}")
+    print(f"🌐 Google 搜索缓存统计: {google_cache.stats()}")
+    print(f"🛡️ AMiner 接口容错统计: {endpoint_stats()}")
+    if get_router() is not None:
+        print(f"🧭 LLM 路由统计: {get_router().stats()}")
+    usage_file = usage_path_for(output_file)
+    ledger.write(usage_file)
+    print(f"🧾 LLM 用量汇总（按阶段）已保存至 {usage_file}: {ledger.summary()['total']}")
 
     incorrect_questions = [{"question": r["question"]} for r in all_results if "error" in r]
     incorrect_file = "glm-incorrect.json"
@@ -5,12 +5,54 @@ import streamlit as st
 from bs4 import BeautifulSoup
 from serpapi import GoogleSearch
 import re
+import unicodedata
 from config import GOOGLE_API_KEY
+from config import GOOGLE_CACHE_PATH, GOOGLE_CACHE_TTL, GOOGLE_CACHE_FAILURE_TTL, GOOGLE_CACHE_MAX_ENTRIES
 import serpapi
+import replay
+from replay import replay_sync
+from cache import DiskCache, make_key
 
 SERPAPI_KEY = ""  # ← 这里放你的 API Key
 
+google_cache = DiskCache(GOOGLE_CACHE_PATH, ttl=GOOGLE_CACHE_TTL, max_entries=GOOGLE_CACHE_MAX_ENTRIES)
+
+_QUERY_EDGE_PUNCT = " \t\n?？!！.。,，;；:：\"'“”‘’"
+
+
+def normalize_query(query: str) -> str:
+    """缓存键用的查询规范化：全半角统一、忽略大小写、合并空白、去掉首尾标点"""
+    query = unicodedata.normalize("NFKC", query or "").casefold()
+    return re.sub(r"\s+", " ", query).strip(_QUERY_EDGE_PUNCT)
+
+
 def google_search_tool(query: str) -> list:
+    """
+    带缓存的 Google Scholar 搜索，参数与返回值见 _serpapi_search
+    成功结果缓存 GOOGLE_CACHE_TTL 秒，失败缓存 GOOGLE_CACHE_FAILURE_TTL 秒（返回空列表）
+    录制 / 回放模式下不读写缓存，每次查询都经过 replay，保证夹具完整
+    """
+    if replay.get_replay_mode() != replay.REPLAY_OFF:
+        return replay_sync("google", {"query": query}, lambda: _serpapi_search(query))
+
+    key = make_key("google", normalize_query(query))
+    entry = google_cache.get(key)
+    if entry is not None:
+        return entry["results"]
+
+    try:
+        results, failed = _serpapi_request(query), False
+    except Exception as e:
+        print(f"❌ SerpApi 调用失败: {e}")
+        results, failed = [], True
+
+    ttl = GOOGLE_CACHE_FAILURE_TTL if failed else GOOGLE_CACHE_TTL
+    if ttl:
+        google_cache.set(key, {"results": results, "failed": failed}, ttl=ttl)
+    return results
+
+
+def _serpapi_search(query: str) -> list:
     """
     使用 SerpApi 的 Google Scholar 搜索接口，返回结构化的 [{title, link, snippet}, ...] 列表
 
@@ -25,28 +67,34 @@ def google_search_tool(query: str) -> list:
               ]
     """
     try:
-        params = {
-            "engine": "google_scholar",
-            "q": query,
-            "api_key": SERPAPI_KEY
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        organic_results = results.get("organic_results", [])
-
-        output = []
-        for item in organic_results:
-            info = {
-                "title": item.get("title"),
-                "link": item.get("link"),
-                "snippet": item.get("snippet")
-            }
-            output.append(info)
-        return output
-
+        return _serpapi_request(query)
     except Exception as e:
         print(f"❌ SerpApi 调用失败: {e}")
         return []
+
+
+def _serpapi_request(query: str) -> list:
+    """实际调用 SerpApi，失败时抛出异常（SerpApi 以 error 字段返回的错误同样视为失败）"""
+    params = {
+        "engine": "google_scholar",
+        "q": query,
+        "api_key": SERPAPI_KEY
+    }
+    search = GoogleSearch(params)
+    results = search.get_dict()
+    if results.get("error"):
+        raise RuntimeError(results["error"])
+    organic_results = results.get("organic_results", [])
+
+    output = []
+    for item in organic_results:
+        info = {
+            "title": item.get("title"),
+            "link": item.get("link"),
+            "snippet": item.get("snippet")
+        }
+        output.append(info)
+    return output
     
 def google_search_tool_old_1124(query: str) -> list:
     """
@@ -0,0 +1,50 @@
+import asyncio
+import weakref
+
+import httpx
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2 包（pip install httpx[http2]）
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 进程级共享的 httpx.AsyncClient：按名称登记，长连接在多次请求、多个问题之间复用。
+# 连接池绑定在创建它的事件循环上（process_questions 每个批次都会 asyncio.run 新的循环），
+# 因此按事件循环分组登记，循环被回收后对应的客户端随之释放
+_CLIENTS = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client(name, max_connections=100, max_keepalive_connections=20,
+                          keepalive_expiry=30.0, timeout=10.0, http2=False, **kwargs):
+    """
+    获取当前事件循环中名为 name 的共享 AsyncClient，不存在时按参数创建
+    http2=True 且安装了 h2 时启用 HTTP/2 多路复用，否则退回 HTTP/1.1
+    """
+    clients = _CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(name)
+    if client is None or client.is_closed:
+        if http2 and not HTTP2_AVAILABLE:
+            print(f"⚠️ 未安装 h2，{name} 连接池退回 HTTP/1.1（pip install httpx[http2] 以启用 HTTP/2）")
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=timeout,
+            http2=http2 and HTTP2_AVAILABLE,
+            **kwargs
+        )
+        clients[name] = client
+    return client
+
+
+async def close_async_http_clients(name=None):
+    """关闭当前事件循环中名为 name 的共享客户端，name 为 None 时全部关闭"""
+    clients = _CLIENTS.get(asyncio.get_running_loop(), {})
+    names = list(clients) if name is None else [name]
+    for n in names:
+        client = clients.pop(n, None)
+        if client is not None:
+            await client.aclose()
@@ -2,9 +2,11 @@ import sys
 import os
 import re
 import langid
-from openai import OpenAI
+from functools import lru_cache
 
 from config import CHATGLM_API_KEY, CHATGLM_API_BASE, DEEPSEEK_API_KEY, DEEPSEEK_API_BASE
+from llm import chat_completion
+from accounting import STAGE_TRANSLATE
 
 language_codes_map = {
     'aa': 'Afar',
@@ -162,6 +164,28 @@ language_codes_rule_reflect = {
     'zh': 'zh'
 }
 
+# 预编译的字符集正则
+_CHAR_SET_PATTERNS = {language: re.compile(pattern) for language, pattern in language_codes_char_set.items()}
+
+# 小中大括号以及中英文书名号、引号内的内容，合并为一个正则一次扫描完成
+_BRACKET_PATTERN = re.compile('|'.join([
+    r'\(.*?\)',
+    r'\[.*?\]',
+    r'\{.*?\}',
+    r'《.*?》',
+    r'‘.*?’',
+    r'“.*?”',
+    r'〈.*?〉',
+    r'【.*?】',
+    r'「.*?」',
+    r'\".*?\"',
+    r'\'.*?\'',
+]))
+
+# 检测结果缓存的条数
+DETECT_CACHE_SIZE = 65536
+
+@lru_cache(maxsize=DETECT_CACHE_SIZE)
 def detect_language(text):
     # 过滤所有括号
     text = filter_brackets_content(text)
@@ -171,7 +195,7 @@ def detect_language(text):
 
     # 规则判断
     for language, reflect in language_codes_rule_reflect.items():
-        if language_code == language and not contains_character_set(text, language_codes_char_set[language]):
+        if language_code == language and not _CHAR_SET_PATTERNS[language].search(text):
             language_code = reflect
 
     if full_ascii(text):
@@ -179,57 +203,38 @@ def detect_language(text):
 
     # 含有中文的一律定向到中文（非日韩）
     if language_code not in ['ja', 'co', 'zh']:
-        if contains_character_set(text, language_codes_char_set['zh']):
+        if _CHAR_SET_PATTERNS['zh'].search(text):
             language_code = 'zh'
 
     return language_code
 
-def filter_brackets_content(text):
-    # 正则表达式匹配小中大括号以及中英文书名号内的内容
-    patterns = [
-        r'\(.*?\)',
-        r'\[.*?\]',
-        r'\{.*?\}',
-        r'《.*?》',
-        r'‘.*?’',
-        r'“.*?”',
-        r'〈.*?〉',
-        r'【.*?】',
-        r'「.*?」',
-        r'\".*?\"',
-        r'\'.*?\'',
-    ]
+def detect_languages(texts):
+    """批量检测语言，按输入顺序返回语言代码列表；重复的字符串只检测一次"""
+    return [detect_language(text) for text in texts]
 
-    for pattern in patterns:
-        text = re.sub(pattern, '', text)
+def filter_brackets_content(text):
+    # 一次扫描去掉所有括号、书名号和引号内的内容（括号交叉嵌套时按最左匹配处理）
+    return _BRACKET_PATTERN.sub('', text)
 
-    return text
+@lru_cache(maxsize=None)
+def _compile_character_set(character_set):
+    return re.compile(character_set)
 
 def contains_character_set(text, character_set):
-    # 正则表达式匹配平假名和片假名
-    kana_pattern = re.compile(character_set)
-    # 检查字符串中是否含有匹配的假名
-    return kana_pattern.search(text)
+    # 检查字符串中是否含有字符集中的字符（正则只编译一次）
+    return _compile_character_set(character_set).search(text)
 
 def full_ascii(s: str) -> bool:
-    # 计算字符串中英文字母的数量
-    alpha_count = sum(c.isascii() for c in s)
-    # print(alpha_count)
-    # 计算字符串的总长度
-    total_length = len(s)
-    # print(total_length)
-    # 判断英文字母数量是否大于总长度的50%
-    return alpha_count == total_length
+    # 字符串是否全部由 ASCII 字符组成
+    return s.isascii()
 
 def translate_to_english(text):
 
-    client = OpenAI(
-        api_key = DEEPSEEK_API_KEY,
-        base_url = DEEPSEEK_API_BASE
-    )
-
-    translator = client.chat.completions.create(
+    return chat_completion(
         model = "deepseek-chat",
+        api_key = DEEPSEEK_API_KEY,
+        base_url = DEEPSEEK_API_BASE,
+        stage = STAGE_TRANSLATE,
         messages = [
             {"role": "system", "content": "You are a professional translation assistant responsible for translating sentences from various languages into English. Your work principles are as follows: 1. Do not add characters arbitrarily, such as adding a hyphen in the middle of a person’s name. 2. Just output the translated English sentence and make sure not to answer any notes. 3. Do not retain any source language, including keywords. 4. If a Chinese name appears, the family name comes after, and the given name comes first!!"},
             {"role": "user", "content": text}
@@ -238,18 +243,14 @@ def translate_to_english(text):
         temperature=0.9       
     )
 
-    return translator.choices[0].message.content
-
 
 def translate_to_chinese(text):
 
-    client = OpenAI(
-        api_key = DEEPSEEK_API_KEY,
-        base_url = DEEPSEEK_API_BASE
-    )
-
-    translator = client.chat.completions.create(
+    return chat_completion(
         model = "deepseek-chat",
+        api_key = DEEPSEEK_API_KEY,
+        base_url = DEEPSEEK_API_BASE,
+        stage = STAGE_TRANSLATE,
         messages = [
             {"role": "system", "content": "你是一个专业的翻译助手，负责将各种语言的句子翻译成中文。你的工作原则如下：1. 不要随意添加字符，例如在人的名字中间添加连字符。2. 只输出翻译后的中文句子，并确保不要回答任何备注"},
             {"role": "user", "content": text}
@@ -258,8 +259,6 @@ def translate_to_chinese(text):
         temperature=0.9       
     )
 
-    return translator.choices[0].message.content
-
 if __name__ == "__main__":
     print(translate_to_chinese("nlp"))
     print(detect_language("こんにちは、世界上的人"))
\ No newline at end of file
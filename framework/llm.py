@@ -1,19 +1,452 @@
-from openai import OpenAI
+import asyncio
+import threading
+import time
+import weakref
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
 
 from config import CHATGLM_API_KEY, CHATGLM_API_BASE, DEEPSEEK_API_KEY, DEEPSEEK_API_BASE, ARK_API_KEY, ARK_API_BASE, ARK_MODEL
+from config import LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY, LLM_TIMEOUT
+from config import LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES, LLM_CACHE_MODE
+from config import LLM_RATE_LIMIT_RETRIES, LLM_STREAM_INCLUDE_USAGE
+from cache import DiskCache, make_key
+from rate_limit import get_limiter, estimate_tokens, is_rate_limit_error
+from singleflight import SingleFlight
+from accounting import ledger
+import replay
+
+# 进程级客户端注册表：按 (base_url, api_key) 复用 OpenAI 客户端，避免每次调用都新建连接池、重新握手
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _http_limits():
+    """连接池大小与 keep-alive 配置（见 config.py 中的 LLM_* 配置项）"""
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client(base_url, api_key):
+    """
+    获取 (base_url, api_key) 对应的长连接 OpenAI 客户端，不存在时创建并登记
+    关闭 SDK 自带的重试（max_retries=0）：429 的退避与重试统一由 rate_limit 负责，
+    否则 SDK 会占着并发名额重试，限流器只能看到一部分 429
+    """
+    key = (base_url, api_key)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=_http_limits(), timeout=LLM_TIMEOUT),
+                )
+                _CLIENTS[key] = client
+    return client
+
+
+def close_clients():
+    """关闭注册表中的所有客户端（进程退出前调用）"""
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
+
+
+# 异步客户端的连接池绑定在创建它的事件循环上（process_questions 每个批次都会 asyncio.run 新的循环），
+# 因此按事件循环分组登记，循环被回收后对应的客户端随之释放
+_ASYNC_CLIENTS = weakref.WeakKeyDictionary()
+
+
+def get_async_client(base_url, api_key):
+    """获取当前事件循环中 (base_url, api_key) 对应的长连接 AsyncOpenAI 客户端（同样关闭 SDK 重试）"""
+    clients = _ASYNC_CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    key = (base_url, api_key)
+    client = clients.get(key)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=LLM_TIMEOUT,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_http_limits(), timeout=LLM_TIMEOUT),
+        )
+        clients[key] = client
+    return client
+
+
+async def close_async_clients():
+    """关闭当前事件循环登记的所有异步客户端（在 asyncio.run 结束前调用）"""
+    clients = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+
+# LLM 响应缓存：按 (model, messages, 采样参数) 的哈希命中，重跑基准时相同 prompt 直接复用结果
+CACHE_READ_THROUGH = "read_through"  # 先查缓存，未命中再请求并写入
+CACHE_WRITE_ONLY = "write_only"  # 总是请求，并用新结果刷新缓存
+CACHE_BYPASS = "bypass"  # 不读不写
+CACHE_MODES = (CACHE_READ_THROUGH, CACHE_WRITE_ONLY, CACHE_BYPASS)
+
+llm_cache = DiskCache(
+    LLM_CACHE_PATH,
+    ttl=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    max_bytes=LLM_CACHE_MAX_BYTES,
+)
+_cache_mode = LLM_CACHE_MODE
+
+
+def set_cache_mode(mode):
+    """切换 LLM 缓存模式（read_through / write_only / bypass），通常在每次运行开始时设置"""
+    global _cache_mode
+    if mode not in CACHE_MODES:
+        raise ValueError(f"未知的缓存模式: {mode}，可选值: {CACHE_MODES}")
+    _cache_mode = mode
+
+
+def get_cache_mode():
+    return _cache_mode
+
+
+def _request_key(model, base_url, messages, kwargs):
+    """
+    请求的内容指纹，同时用作缓存键和 single-flight 合并键
+    包含 base_url：不同服务商的同名模型不共享缓存和在途结果
+    """
+    return make_key("chat", model, (base_url or "").rstrip("/"), messages, kwargs)
+
+
+def _cache_lookup(key):
+    """
+    返回 (写入用的缓存键, 命中的内容)；bypass 模式下写入键为 None
+    录制 / 回放模式下同样不读写缓存：缓存命中会跳过录制，导致夹具不完整
+    """
+    if _cache_mode == CACHE_BYPASS or replay.get_replay_mode() != replay.REPLAY_OFF:
+        return None, None
+    if _cache_mode == CACHE_READ_THROUGH:
+        return key, llm_cache.get(key)
+    return key, None
+
+
+def _cache_store(key, content):
+    # 只缓存非空的文本结果，错误不会被缓存
+    if key is not None and isinstance(content, str) and content:
+        llm_cache.set(key, content)
+
+
+def usage_from_response(usage):
+    """
+    将响应中的 usage 整理为 dict：prompt / completion / total / cached token 数
+    cached_tokens 为服务商前缀缓存命中的输入 token（OpenAI 兼容接口在 prompt_tokens_details 中，
+    DeepSeek 为 prompt_cache_hit_tokens）
+    """
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "total_tokens": getattr(usage, "total_tokens", None) or 0,
+        "cached_tokens": cached or 0,
+    }
+
+
+def _total_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _create_limited(client, model, messages, base_url, kwargs):
+    """在服务商限流器的约束下发起请求，429 时退避重试（阻塞版本）"""
+    limiter = get_limiter(model, base_url)
+    estimated = estimate_tokens(messages)
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire_sync(estimated)
+        start = time.monotonic()
+        try:
+            response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            limiter.release(time.monotonic() - start, rate_limited=rate_limited)
+            if rate_limited and attempt < LLM_RATE_LIMIT_RETRIES:
+                time.sleep(limiter.backoff(attempt))
+                continue
+            raise
+        limiter.release(time.monotonic() - start, tokens_estimated=estimated, tokens_used=_total_tokens(response))
+        return response
+
+
+async def _async_create_limited(client, model, messages, base_url, kwargs):
+    """_create_limited 的异步版本，等待与退避都不阻塞事件循环"""
+    limiter = get_limiter(model, base_url)
+    estimated = estimate_tokens(messages)
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire(estimated)
+        start = time.monotonic()
+        try:
+            response = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            limiter.release(time.monotonic() - start, rate_limited=rate_limited)
+            if rate_limited and attempt < LLM_RATE_LIMIT_RETRIES:
+                await asyncio.sleep(limiter.backoff(attempt))
+                continue
+            raise
+        except BaseException:
+            # 被取消（如对冲请求落败）时同样要归还并发名额
+            limiter.release(time.monotonic() - start, cancelled=True)
+            raise
+        limiter.release(time.monotonic() - start, tokens_estimated=estimated, tokens_used=_total_tokens(response))
+        return response
+
+
+def _replay_request(model, messages, kwargs):
+    """录制/回放时用于匹配夹具的请求内容（流式与非流式共用）"""
+    return {"model": model, "messages": messages, "params": kwargs}
+
+
+# 相同请求并发时只向上游发送一次（例如多个问题同时翻译同一查询、同一问题的规划）
+_inflight = SingleFlight()
+
+
+# 命中本地响应缓存时的用量：未消耗任何 token
+_CACHE_HIT_USAGE = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0, "response_cached": True}
+
+
+def chat_completion(messages, model, api_key, base_url, usage=None, stage=None, **kwargs):
+    """
+    使用共享客户端发起一次对话补全，返回文本内容，异常直接抛出
+    usage: 可选 dict，调用后写入本次的 token 用量（见 usage_from_response）
+    stage: 调用阶段标签（见 accounting.py），用于按阶段统计 token 与耗时
+    """
+    key = _request_key(model, base_url, messages, kwargs)
+    content, call_usage = _inflight.do(key, _chat_completion, key, messages, model, api_key, base_url, stage, kwargs)
+    if usage is not None:
+        usage.update(call_usage)
+    return content
+
+
+def _chat_completion(request_key, messages, model, api_key, base_url, stage, kwargs):
+    start = time.monotonic()
+    key, cached = _cache_lookup(request_key)
+    if cached is not None:
+        ledger.record(stage, model, _CACHE_HIT_USAGE, time.monotonic() - start)
+        return cached, _CACHE_HIT_USAGE
+
+    def fetch():
+        response = _create_limited(get_client(base_url, api_key), model, messages, base_url, kwargs)
+        return response.choices[0].message.content, usage_from_response(response.usage)
+
+    try:
+        content, call_usage = replay.replay_sync("llm", _replay_request(model, messages, kwargs), fetch)
+    except Exception as e:
+        ledger.record(stage, model, None, time.monotonic() - start, error=e)
+        raise
+    _cache_store(key, content)
+    ledger.record(stage, model, call_usage, time.monotonic() - start)
+    return content, call_usage
+
+
+async def async_chat_completion(messages, model, api_key, base_url, usage=None, stage=None, **kwargs):
+    """chat_completion 的异步版本，不阻塞事件循环"""
+    key = _request_key(model, base_url, messages, kwargs)
+    content, call_usage = await _inflight.do_async(key, _async_chat_completion, key, messages, model, api_key, base_url, stage, kwargs)
+    if usage is not None:
+        usage.update(call_usage)
+    return content
+
+
+async def _async_chat_completion(request_key, messages, model, api_key, base_url, stage, kwargs):
+    start = time.monotonic()
+    key, cached = _cache_lookup(request_key)
+    if cached is not None:
+        ledger.record(stage, model, _CACHE_HIT_USAGE, time.monotonic() - start)
+        return cached, _CACHE_HIT_USAGE
+
+    async def fetch():
+        response = await _async_create_limited(get_async_client(base_url, api_key), model, messages, base_url, kwargs)
+        return response.choices[0].message.content, usage_from_response(response.usage)
+
+    try:
+        content, call_usage = await replay.replay_async("llm", _replay_request(model, messages, kwargs), fetch)
+    except Exception as e:
+        ledger.record(stage, model, None, time.monotonic() - start, error=e)
+        raise
+    _cache_store(key, content)
+    ledger.record(stage, model, call_usage, time.monotonic() - start)
+    return content, call_usage
+
+
+class LLMStream:
+    """
+    流式补全：async for 逐段产出增量文本；迭代结束后 text 为完整结果，
+    stats 记录首 token 延迟（ttft）、总耗时、生成 token 数与生成速度（tokens/s）
+    """
+
+    def __init__(self, messages, model, api_key, base_url, stage=None, **kwargs):
+        self.messages = messages
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.stage = stage
+        self.kwargs = kwargs
+        self.text = None
+        self.stats = {}
+        self._started = False
+
+    def __aiter__(self):
+        if self._started:
+            raise RuntimeError("LLMStream 只能迭代一次")
+        self._started = True
+        return self._run()
+
+    async def collect(self):
+        """消费整个流并返回拼接后的完整文本"""
+        async for _ in self:
+            pass
+        return self.text
+
+    async def _open(self, client, limiter, estimated):
+        """建立流式连接（429 时退避重试），返回 (响应流, 开始时间)"""
+        kwargs = dict(self.kwargs, stream=True)
+        if LLM_STREAM_INCLUDE_USAGE:
+            kwargs["stream_options"] = {"include_usage": True}
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            await limiter.acquire(estimated)
+            start = time.monotonic()
+            try:
+                response = await client.chat.completions.create(model=self.model, messages=self.messages, **kwargs)
+                return response, start
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                limiter.release(time.monotonic() - start, rate_limited=rate_limited)
+                if rate_limited and attempt < LLM_RATE_LIMIT_RETRIES:
+                    await asyncio.sleep(limiter.backoff(attempt))
+                    continue
+                raise
+            except BaseException:
+                # 建立连接时被取消，同样归还并发名额
+                limiter.release(time.monotonic() - start, cancelled=True)
+                raise
+
+    async def _run(self):
+        key, cached = _cache_lookup(_request_key(self.model, self.base_url, self.messages, self.kwargs))
+        if cached is not None:
+            self.text = cached
+            self.stats = dict(_CACHE_HIT_USAGE, ttft=0.0, latency=0.0, tokens_per_sec=None)
+            ledger.record(self.stage, self.model, _CACHE_HIT_USAGE, 0.0)
+            yield cached
+            return
+
+        replay_request = _replay_request(self.model, self.messages, self.kwargs)
+        if replay.get_replay_mode() == replay.REPLAY_REPLAY:
+            # 回放：模拟延迟后一次性产出录制的完整文本
+            try:
+                text, usage = replay.lookup("llm", replay_request)
+            except replay.ReplayMiss as e:
+                ledger.record(self.stage, self.model, None, 0.0, error=e)
+                raise
+            latency = replay.synthetic_latency("llm")
+            await asyncio.sleep(latency)
+            self.text = text
+            self.stats = dict(usage, ttft=round(latency, 3), latency=round(latency, 3), tokens_per_sec=None)
+            ledger.record(self.stage, self.model, usage, latency)
+            yield text
+            return
+
+        client = get_async_client(self.base_url, self.api_key)
+        limiter = get_limiter(self.model, self.base_url)
+        estimated = estimate_tokens(self.messages)
+        try:
+            response, start = await self._open(client, limiter, estimated)
+        except Exception as e:
+            ledger.record(self.stage, self.model, None, 0.0, error=e)
+            raise
+
+        parts = []
+        ttft = None
+        chunks = 0
+        usage = None
+        try:
+            async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.monotonic() - start
+                chunks += 1
+                parts.append(delta)
+                yield delta
+        finally:
+            latency = time.monotonic() - start
+            await response.close()
+            limiter.release(latency, tokens_estimated=estimated, tokens_used=getattr(usage, "total_tokens", None))
+
+        # 服务商不返回 usage 时，以增量片段数近似生成 token 数
+        usage = usage_from_response(usage)
+        completion_tokens = usage.get("completion_tokens") or chunks
+        generation_time = latency - (ttft or 0.0)
+        self.text = "".join(parts)
+        self.stats = dict(
+            usage,
+            completion_tokens=completion_tokens,
+            ttft=round(ttft, 3) if ttft is not None else None,
+            latency=round(latency, 3),
+            tokens_per_sec=round(completion_tokens / generation_time, 2) if generation_time > 0 else None,
+        )
+        ledger.record(self.stage, self.model, usage, latency)
+        _cache_store(key, self.text)
+        if replay.get_replay_mode() == replay.REPLAY_RECORD:
+            replay.record("llm", replay_request, [self.text, usage])
+
 
 # def llm_client(prompt, query, model=ARK_MODEL, api_key=ARK_API_KEY, base_url=ARK_API_BASE):
 # def llm_client(prompt, query, model="glm-4.7", api_key=CHATGLM_API_KEY, base_url=CHATGLM_API_BASE):
-def llm_client(prompt, query, model="gemini-3-pro-preview-11-2025", api_key="", base_url="https://yunwu.ai/v1"):
+def llm_client(prompt, query, model="gemini-3-pro-preview-11-2025", api_key="", base_url="https://yunwu.ai/v1", usage=None, stage=None):
 
     try:
-        client = OpenAI(
+        return chat_completion(
+            messages = [
+                {"role": "system", 
+                "content": prompt
+                },
+                {"role": "user",
+                "content": query
+                },
+            ],
+            model=model,
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            usage=usage,
+            stage=stage,
+            temperature=0.95,
+            top_p=0.7,
         )
 
-        conclusion = client.chat.completions.create(
-            model = model,
+    except Exception as e:
+        return {"error": str(e)}
+
+async def async_llm_client(prompt, query, model="gemini-3-pro-preview-11-2025", api_key="", base_url="https://yunwu.ai/v1", usage=None, stage=None):
+    """llm_client 的异步版本：prompt 作为 system、query 作为 user，出错时返回 {"error": ...}"""
+
+    try:
+        return await async_chat_completion(
             messages = [
                 {"role": "system", 
                 "content": prompt
@@ -22,15 +455,41 @@ def llm_client(prompt, query, model="gemini-3-pro-preview-11-2025", api_key="",
                 "content": query
                 },
             ],
+            model=model,
+            api_key=api_key,
+            base_url=base_url,
+            usage=usage,
+            stage=stage,
             temperature=0.95,
             top_p=0.7,
         )
 
-        return conclusion.choices[0].message.content
-
     except Exception as e:
         return {"error": str(e)}
 
+def async_llm_stream(prompt, query, model="gemini-3-pro-preview-11-2025", api_key="", base_url="https://yunwu.ai/v1", stage=None):
+    """async_llm_client 的流式版本，返回 LLMStream；与其他调用不同，出错时直接抛出异常"""
+    return LLMStream(
+        messages = [
+            {"role": "system", 
+            "content": prompt
+            },
+            {"role": "user",
+            "content": query
+            },
+        ],
+        model=model,
+        api_key=api_key,
+        base_url=base_url,
+        stage=stage,
+        temperature=0.95,
+        top_p=0.7,
+    )
+
+def inflight_stats():
+    """single-flight 统计：executed 为实际发出的请求数，shared 为被合并的重复请求数"""
+    return _inflight.stats()
+
 if __name__ == "__main__":
     
     print(llm_client(
@@ -42,4 +501,4 @@ if __name__ == "__main__":
         )
     )
 
-    
\ No newline at end of file
+    
@@ -0,0 +1,267 @@
+"""
+工具层压测：对 mock_server.py（或兼容的真实服务）发起大量并发调用，
+统计吞吐、p50/p95/p99 延迟、错误数以及服务端的连接数
+
+    python loadtest.py --target tools --endpoint search_paper_detail --concurrency 100 --requests 2000
+    python loadtest.py --target aminer --endpoint search_paper_id --concurrency 1000 --latency lognormal:0.2:0.5
+
+--target:
+    tools     tools.call_custom_server（自定义服务器传输层）
+    aminer    AMinerAPI.call_api（datacenter 传输层，含重试 / 熔断）
+    executor  TaskExecutor.execute_api_call（含参数校验、微批、缓存与字段投影）
+未指定 --server 时自动在子进程中启动 mock_server.py
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from config import API_CONFIG
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各接口在自定义服务器上的 ID 参数名（datacenter 统一为 ids）
+TOOL_ID_PARAMS = {
+    "search_paper_detail": "paper_ids",
+    "search_author_detail": "author_ids",
+    "search_venue_detail": "venue_ids",
+    "search_org_detail": "org_ids",
+}
+WORDS = ["nlp", "graph", "retrieval", "agent", "vision", "speech", "robotics", "reasoning"]
+
+
+def percentile(samples, p):
+    """最近秩法分位数（samples 已排序）"""
+    if not samples:
+        return None
+    return samples[max(1, math.ceil(p / 100 * len(samples))) - 1]
+
+
+def make_params(target, endpoint, ids_per_call, size):
+    """每次调用生成不同的参数，避免被缓存吸收"""
+    if endpoint.endswith("_detail"):
+        ids = [uuid.uuid4().hex[:24] for _ in range(ids_per_call)]
+        key = TOOL_ID_PARAMS[endpoint] if target != "aminer" else "ids"
+        if target == "executor" and endpoint in ("search_venue_detail", "search_org_detail"):
+            key = "ids"
+        return {key: ids}
+    return {"keywords": [random.choice(WORDS), uuid.uuid4().hex[:8]], "size": size}
+
+
+def make_caller(target, server):
+    """返回 call(endpoint, params) 协程函数，并把对应传输层指向 server"""
+    if target == "tools":
+        import tools
+        tools.CUSTOM_SERVER_BASE = server + "/"
+        return tools.call_custom_server
+    if target in ("aminer", "executor"):
+        import api
+        # 未配置 token 时 "Bearer " 是非法请求头，压测 mock server 时用占位 token
+        api.API_TOKEN = api.API_TOKEN or "loadtest"
+    if target == "aminer":
+        from api import AMinerAPI
+        aminer = AMinerAPI()
+        aminer.base_url = server
+        return lambda endpoint, params: aminer.call_api(endpoint, params)
+    if target == "executor":
+        import tools
+        import api
+        from caller import TaskExecutor
+        tools.CUSTOM_SERVER_BASE = server + "/"
+        executor = TaskExecutor([])
+        executor.aminer_api.base_url = server
+        # 微批中的 datacenter 请求会新建 AMinerAPI 实例，同样指向 server
+        api.AMINER_BASE_URL = server
+
+        async def call(endpoint, params):
+            _, response = await executor.execute_api_call(endpoint, params)
+            return response
+        return call
+    raise ValueError(f"未知的压测目标: {target}")
+
+
+@contextlib.contextmanager
+def isolated_caches():
+    """
+    压测期间把检索缓存和实体缓存换成临时实例，结束后恢复：
+    mock 数据不写入正式缓存文件，也不挤占正式缓存的 LRU 条目
+    """
+    import search_cache
+    import detail_batcher
+    from cache import DiskCache
+    from entity_cache import EntityCache
+
+    saved = search_cache.search_cache, detail_batcher.entity_cache
+    with tempfile.TemporaryDirectory(prefix="loadtest-cache-") as tmp:
+        temp_search_cache = DiskCache(os.path.join(tmp, "search_cache.sqlite3"), ttl=search_cache.SEARCH_CACHE_TTL)
+        search_cache.search_cache = temp_search_cache
+        detail_batcher.entity_cache = EntityCache()
+        try:
+            yield
+        finally:
+            search_cache.search_cache, detail_batcher.entity_cache = saved
+            temp_search_cache.close()
+
+
+def _is_error(response):
+    return not isinstance(response, dict) or "error" in response
+
+
+async def _sample_connections(server, samples, stop):
+    """定期读取服务端连接数（采样本身占用 1 个连接，已扣除）"""
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        while not stop.is_set():
+            try:
+                stats = (await client.get(f"{server}/__stats")).json()
+                samples.append(max(0, stats["open_connections"] - 1))
+            except httpx.HTTPError:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), 0.25)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run_load(args, server):
+    call = make_caller(args.target, server)
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        await client.post(f"{server}/__reset")
+
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < args.requests:
+            issued += 1
+            params = make_params(args.target, args.endpoint, args.ids_per_call, args.size)
+            start = time.perf_counter()
+            try:
+                response = await call(args.endpoint, params)
+                failed = _is_error(response)
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    connection_samples = []
+    stop = asyncio.Event()
+    sampler = asyncio.ensure_future(_sample_connections(server, connection_samples, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        server_stats = (await client.get(f"{server}/__stats")).json()
+
+    if args.target in ("tools", "executor"):
+        from tools import close_custom_server_client
+        await close_custom_server_client()
+    if args.target in ("aminer", "executor"):
+        from api import AMinerAPI
+        await AMinerAPI.shutdown()
+
+    latencies.sort()
+    return {
+        "target": args.target,
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)
+        } if latencies else {},
+        "open_connections": {
+            "peak_sampled": max(connection_samples, default=0),
+            "mean_sampled": round(sum(connection_samples) / len(connection_samples), 1) if connection_samples else 0,
+        },
+        "server": server_stats,
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(args):
+    """在子进程中启动 mock_server.py，返回 (进程, 地址)"""
+    port = _free_port()
+    command = [
+        sys.executable, os.path.join(_DIR, "mock_server.py"),
+        "--port", str(port),
+        "--latency", args.latency,
+        "--error-rate", str(args.error_rate),
+        "--record-bytes", str(args.record_bytes),
+    ]
+    for item in args.latency_for:
+        command += ["--latency-for", item]
+    process = subprocess.Popen(command, cwd=_DIR)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("mock server 启动超时")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="工具层并发压测")
+    parser.add_argument("--target", choices=["tools", "aminer", "executor"], default="tools")
+    parser.add_argument("--endpoint", choices=list(API_CONFIG), default="search_paper_detail")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--ids-per-call", type=int, default=5, help="详情接口每次请求的 ID 数")
+    parser.add_argument("--size", type=int, default=10, help="检索接口的 size")
+    parser.add_argument("--server", default=None, help="已运行的服务地址，如 http://127.0.0.1:8600")
+    parser.add_argument("--output", default=None, help="结果写入的 JSON 文件")
+    # 以下参数在自动启动 mock server 时生效
+    parser.add_argument("--latency", default="fixed:0.05")
+    parser.add_argument("--latency-for", action="append", default=[])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--record-bytes", type=int, default=512)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    process = None
+    server = args.server
+    if server is None:
+        process, server = start_mock_server(args)
+    try:
+        with isolated_caches() if args.target == "executor" else contextlib.nullcontext():
+            result = asyncio.run(run_load(args, server.rstrip("/")))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
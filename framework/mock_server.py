@@ -0,0 +1,196 @@
+"""
+AMiner datacenter / 自定义工具服务器的本地替身，用于压测工具层（见 loadtest.py）
+
+- 实现 API_CONFIG 中的 8 个 datacenter 接口，以及 CUSTOM_SERVER_BASE 下的同名路由（/search_paper_id 等）
+- 延迟分布、错误率、返回条数与单条记录大小均可配置
+- GET /__stats 返回请求数、当前 / 峰值连接数，POST /__reset 清零统计
+
+    python mock_server.py --port 8600 --latency lognormal:0.2:0.5 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import time
+import uuid
+
+from config import API_CONFIG
+
+# datacenter 路径 -> 接口名；自定义服务器的路由就是 "/" + 接口名
+ROUTES = {info["endpoint"]: name for name, info in API_CONFIG.items()}
+ROUTES.update({f"/{name}": name for name in API_CONFIG})
+
+# 详情接口中可能出现的 ID 列表字段
+ID_PARAMS = ("ids", "paper_ids", "author_ids", "venue_ids", "org_ids")
+
+
+def parse_latency(spec):
+    """
+    延迟分布描述 -> 采样函数（秒）
+    fixed:0.1 / uniform:0.05:0.3 / lognormal:中位数:sigma / exp:均值
+    """
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda: args[0]
+    if kind == "uniform":
+        return lambda: random.uniform(args[0], args[1])
+    if kind == "lognormal":
+        median, sigma = args
+        return lambda: random.lognormvariate(0, sigma) * median
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / args[0])
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+class MockServer:
+    def __init__(self, latency="fixed:0.05", latency_for=None, error_rate=0.0, record_bytes=512, default_size=10):
+        self.latency = parse_latency(latency)
+        self.latency_for = {name: parse_latency(spec) for name, spec in (latency_for or {}).items()}
+        self.error_rate = error_rate
+        self.record_bytes = record_bytes
+        self.default_size = default_size
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections = 0
+        self.peak_connections = 0
+        self.total_connections = 0
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "open_connections": self.connections,
+            "peak_connections": self.peak_connections,
+            "total_connections": self.total_connections,
+        }
+
+    def _record(self, api_name, id_=None):
+        id_ = id_ or uuid.uuid4().hex[:24]
+        entity = api_name.split("_")[1]
+        return {
+            "id": id_,
+            "title" if entity == "paper" else "name": f"mock {entity} {id_}",
+            "n_citation": random.randint(0, 10000),
+            "year": random.randint(1990, 2025),
+            # 填充字段，控制单条记录的大小
+            "abstract": "x" * self.record_bytes,
+        }
+
+    def _payload(self, api_name, params):
+        if api_name.endswith("_detail"):
+            ids = next((params[p] for p in ID_PARAMS if params.get(p)), [])
+            data = [self._record(api_name, str(i)) for i in ids]
+        else:
+            size = params.get("size") or self.default_size
+            data = [self._record(api_name) for _ in range(int(size))]
+        return {"code": 200, "success": True, "msg": "", "data": data, "total": len(data)}
+
+    async def handle(self, method, path, body):
+        """返回 (状态码, 响应对象)"""
+        if path == "/__stats":
+            return 200, self.stats()
+        if path == "/__reset":
+            self.reset()
+            return 200, {"ok": True}
+        api_name = ROUTES.get(path.split("?")[0])
+        if api_name is None:
+            return 404, {"error": f"unknown path {path}"}
+
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency_for.get(api_name, self.latency)())
+            if random.random() < self.error_rate:
+                self.errors += 1
+                return 500, {"error": "mock server error"}
+            try:
+                params = json.loads(body) if body else {}
+            except ValueError:
+                return 400, {"error": "invalid json"}
+            return 200, self._payload(api_name, params if isinstance(params, dict) else {})
+        finally:
+            self.in_flight -= 1
+
+    async def serve_connection(self, reader, writer):
+        """HTTP/1.1 长连接：同一连接上依次处理多个请求，直到客户端关闭"""
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections += 1
+        self.total_connections += 1
+        self.peak_connections = max(self.peak_connections, self.connections)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.handle(method, path, body)
+                raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'ERROR'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(raw)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + raw
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8600):
+        # backlog 调大，避免上千并发建连时被拒绝
+        return await asyncio.start_server(self.serve_connection, host, port, backlog=4096)
+
+
+async def main(args):
+    latency_for = dict(item.split("=", 1) for item in args.latency_for)
+    mock = MockServer(args.latency, latency_for, args.error_rate, args.record_bytes, args.default_size)
+    server = await mock.start(args.host, args.port)
+    print(f"mock server 已启动: http://{args.host}:{args.port} ({time.strftime('%H:%M:%S')})", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AMiner / 自定义工具服务器的本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency", default="fixed:0.05", help="延迟分布，如 lognormal:0.2:0.5")
+    parser.add_argument("--latency-for", action="append", default=[], help="单个接口的延迟，如 search_paper_id=fixed:1")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--record-bytes", type=int, default=512, help="每条记录的填充字节数")
+    parser.add_argument("--default-size", type=int, default=10, help="检索请求未指定 size 时的返回条数")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        pass
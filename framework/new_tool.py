@@ -1,8 +1,7 @@
+import re
 import json
 import asyncio
-import requests
-import concurrent.futures
-from difflib import SequenceMatcher
+import weakref
 
 from typing_extensions import Annotated, Doc
 from openai import OpenAI
@@ -12,36 +11,67 @@ from config import (
     CHATGLM_API_KEY,
     CHATGLM_API_BASE,
     DEEPSEEK_API_KEY,
+    AMINER_SEARCH_URL,
+    AMINER_SEARCH_MAX_CONNECTIONS,
+    AMINER_SEARCH_MAX_CONCURRENCY,
+    AMINER_SEARCH_TITLE_TIMEOUT,
 )
 from apis import search_paper_id
 from language import translate_to_english
-from llm import llm_client
-
-def search_paper_title_via_aminer(title):
+from llm import async_llm_stream, close_async_clients
+from replay import replay_async
+from http_pool import get_async_http_client, close_async_http_clients
+from accounting import STAGE_GS_TITLES
+from title_match import TitleIndex, similarity, DEFAULT_THRESHOLD
+
+# 标题查询的共享连接池与并发上限（按事件循环分别创建）
+POOL_NAME = "aminer_search"
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+def _title_search_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = _SEMAPHORES[loop] = asyncio.Semaphore(AMINER_SEARCH_MAX_CONCURRENCY)
+    return semaphore
+
+async def close_title_search_client():
+    """关闭当前事件循环中标题查询的共享连接（在事件循环结束前调用）"""
+    await close_async_http_clients(POOL_NAME)
+
+async def search_paper_title_via_aminer_async(title):
+    """用 AMiner 检索接口按标题查询论文，共享连接池并限制并发"""
+    return await replay_async("aminer_search", {"title": title}, lambda: _post_title_search_async(title))
+
+async def _post_title_search_async(title):
     params = {"query": title, "needDetails":True, "page":0, "size":20, 'filters': []}
+    client = get_async_http_client(
+        POOL_NAME,
+        max_connections=AMINER_SEARCH_MAX_CONNECTIONS,
+        max_keepalive_connections=AMINER_SEARCH_MAX_CONNECTIONS,
+        timeout=AMINER_SEARCH_TITLE_TIMEOUT,
+    )
+    # 与同步版本一致：出错时返回 []，录制模式下失败结果同样写入夹具
     try:
-        res = requests.post("https://searchtest.aminer.cn/aminer-search/search/publication", json=params, timeout=60)
-        res_dict = json.loads(res.text)
-        papers = res_dict["data"].get("hitList", [])
-    except:
+        async with _title_search_semaphore():
+            res = await client.post(AMINER_SEARCH_URL, json=params)
+        papers = res.json()["data"].get("hitList", [])
+    except Exception as e:
+        print(f"⚠️ 标题查询失败: {title}: {e}")
         papers = []
     return papers
 
-def parse_user_query_to_structured_params(user_query: str):
-    """
-    先调用 Google 获取搜索结果，再用大模型总结参数
-    """
-
-    user_query = translate_to_english(user_query)
-
-    # 第一步：Google搜索
-    google_results = google_search_tool(user_query)
-    search_context = "\n".join([
-        f"网页标题: {r['title']}\n网页摘要: {r['snippet']}" for r in google_results
-    ][:20])  # 限制前20项，避免prompt过长
-
-    # 第二步：提示构造
-    system_prompt = """你是一个智能的学术搜索参数提取助手。
+async def _resolve_title(title, timeout=AMINER_SEARCH_TITLE_TIMEOUT):
+    """查询单个标题，超过 timeout 秒（含排队）即取消该请求并返回 []"""
+    try:
+        return await asyncio.wait_for(search_paper_title_via_aminer_async(title), timeout)
+    except asyncio.TimeoutError:
+        print(f"⚠️ 标题查询超时（{timeout} 秒），已取消: {title}")
+    except Exception as e:
+        print(f"⚠️ 标题查询失败: {title}: {e}")
+    return []
+
+TITLE_SYSTEM_PROMPT = """你是一个智能的学术搜索参数提取助手。
 用户会输入一个学术查询，你需要根据用户问题 + Google 搜索结果，
 提取出可供 search_paper_id 调用的参数。
 
@@ -52,7 +82,14 @@ def parse_user_query_to_structured_params(user_query: str):
 输出格式为纯JSON，无解释。
 """
 
-    user_prompt = f"""
+def _build_search_context(google_results):
+    # 限制前20项，避免prompt过长
+    return "\n".join([
+        f"网页标题: {r['title']}\n网页摘要: {r['snippet']}" for r in google_results
+    ][:20])
+
+def _build_title_prompt(user_query, search_context):
+    return f"""
 用户问题如下：
 {user_query}
 
@@ -61,9 +98,9 @@ def parse_user_query_to_structured_params(user_query: str):
 
 请基于以上内容，输出JSON.
 """
-    
-    reply = llm_client(system_prompt, user_prompt)
-    print("大模型返回：", reply)
+
+def _parse_title_reply(reply):
+    """解析大模型返回的 JSON（兼容 Markdown 代码块），失败时返回 {}"""
     try:
         clean_reply = reply.strip()
 
@@ -82,29 +119,129 @@ def parse_user_query_to_structured_params(user_query: str):
         print("⚠️ JSON解析失败，原始返回：", reply)
         params = {}
 
-    return params,search_context
+    return params
 
-def string_similarity(a: str, b: str) -> float:
-    """计算两个字符串的相似度（0~100之间）"""
-    return SequenceMatcher(None, a, b).ratio() * 100
+_TITLES_KEY = re.compile(r'"?titles"?\s*:\s*\[')
+_TITLE_ITEM = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*([,\]])')
 
-def search_paper_id_gs_tool(query: str):
+class TitleStreamParser:
     """
-    根据用户查询 query 搜索论文，
-    并只保留标题与网页标题相似度>=80%的论文ID。
-    - search_paper_title_via_aminer(title) 返回 list，每个元素为 dict。
-    - 只取每个 list 的第一个 paper。
-    - 等所有并发任务返回后统一过滤。
+    从流式返回的 JSON 中增量解析 titles 列表：
+    每当一个标题字符串完整出现（其后已跟 , 或 ]）就产出，不必等整个列表生成完
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None
+        self.done = False
+
+    def feed(self, delta):
+        """追加一段文本，返回本次新解析出的标题列表"""
+        self.buffer += delta
+        titles = []
+        if self.done:
+            return titles
+        if self.pos is None:
+            m = _TITLES_KEY.search(self.buffer)
+            if m is None:
+                return titles
+            self.pos = m.end()
+        while True:
+            m = _TITLE_ITEM.match(self.buffer, self.pos)
+            if m is None:
+                break
+            self.pos = m.end()
+            try:
+                titles.append(json.loads(f'"{m.group(1)}"'))
+            except json.JSONDecodeError:
+                titles.append(m.group(1))
+            if m.group(2) == "]":
+                self.done = True
+                break
+        return titles
+
+async def _search_google(query):
+    try:
+        return await asyncio.to_thread(google_search_tool, query)
+    except Exception as e:
+        # 回放模式下缺少该查询的夹具等
+        print(f"⚠️ Google 搜索失败: {query}: {e}")
+        return []
+
+async def _google_results(user_query):
     """
+    Google 上下文与原先一致，取英文译文的搜索结果；
+    译文搜索没有结果（或翻译失败）时再用原始查询搜索一次
+    返回 (英文查询, Google 结果)
+    """
+    try:
+        translated = await asyncio.to_thread(translate_to_english, user_query)
+    except Exception as e:
+        print(f"⚠️ 翻译失败，使用原始查询: {e}")
+        translated = None
+    if not translated or translated == user_query:
+        return user_query, await _search_google(user_query)
+    google_results = await _search_google(translated)
+    if not google_results:
+        google_results = await _search_google(user_query)
+    return translated, google_results
+
+async def _stream_and_resolve_titles(user_prompt):
+    """
+    流式生成标题，每解析出一个标题立即发起 AMiner 查询
+    返回 (标题列表, 按标题顺序的查询结果)
+    """
+    parser = TitleStreamParser()
+    lookups = {}
+
+    def launch(title):
+        if isinstance(title, str) and title not in lookups:
+            lookups[title] = asyncio.create_task(_resolve_title(title))
 
-    params, search_context = parse_user_query_to_structured_params(query)
+    stream = async_llm_stream(TITLE_SYSTEM_PROMPT, user_prompt, stage=STAGE_GS_TITLES)
+    streamed = []
+    try:
+        async for delta in stream:
+            for title in parser.feed(delta):
+                streamed.append(title)
+                launch(title)
+        reply = stream.text
+        print("大模型返回：", reply)
+        params = _parse_title_reply(reply)
+        titles = params.get("titles", []) if isinstance(params, dict) else params
+        if not isinstance(titles, list):
+            titles = []
+        if not titles:
+            titles = streamed
+    except Exception as e:
+        # 流中断时保留已解析出的标题
+        print(f"⚠️ 标题生成失败: {e}")
+        titles = streamed
+    except BaseException:
+        for task in lookups.values():
+            task.cancel()
+        raise
+
+    # 流式解析遗漏的标题（格式不规范等）在此补发
+    for title in titles:
+        launch(title)
+    titles = [t for t in titles if isinstance(t, str)]
+    for title, task in lookups.items():
+        if title not in titles:
+            task.cancel()
+    results = await asyncio.gather(*(lookups[t] for t in titles))
+    return titles, results
+
+def string_similarity(a: str, b: str) -> float:
+    """计算两个字符串的相似度（0~100之间），见 title_match.similarity"""
+    return similarity(a, b)
 
+def _match_paper_ids(titles_from_context, results):
+    """每个检索结果只取第一篇论文，标题与网页标题相似度 >= 80 时保留其 ID"""
     idlist = []
-    titles_from_context = params.get("titles", []) if isinstance(params, dict) else params
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [executor.submit(search_paper_title_via_aminer, title) for title in titles_from_context]
-        results = [f.result() for f in concurrent.futures.as_completed(futures)]  
+    # 网页标题只预处理一次，每个检索结果先用上界排除不可能匹配的标题，再计算相似度
+    title_index = TitleIndex(titles_from_context)
 
     for result in results:
         # 每个 result 预期是一个 list
@@ -120,14 +257,39 @@ def search_paper_id_gs_tool(query: str):
         if not paper_title:
             continue
 
-        for ctx_title in titles_from_context:
-            similarity = string_similarity(paper_title.lower(), ctx_title.lower())
+        if title_index.best_match(paper_title, DEFAULT_THRESHOLD) is not None:
+            idlist.append(paper["id"])
+
+    return idlist
+
+async def search_paper_id_gs_tool_async(query: str):
+    """
+    根据用户查询 query 搜索论文，
+    并只保留标题与网页标题相似度>=80%的论文ID。
+    - Google 搜索使用英文译文，译文没有结果时改用原始查询
+    - 大模型流式输出标题，每个标题一出现就开始 AMiner 查询（与生成重叠），单个标题超时取消
+    """
+
+    user_query, google_results = await _google_results(query)
+    search_context = _build_search_context(google_results)
+    user_prompt = _build_title_prompt(user_query, search_context)
+
+    titles_from_context, results = await _stream_and_resolve_titles(user_prompt)
+
+    return _match_paper_ids(titles_from_context, results), search_context
+
+def search_paper_id_gs_tool(query: str):
+    """search_paper_id_gs_tool_async 的同步入口（在独立事件循环中执行）"""
 
-            if similarity >= 80:
-                idlist.append(paper["id"])
-                break  # 匹配到一个即可跳出
+    async def run():
+        try:
+            return await search_paper_id_gs_tool_async(query)
+        finally:
+            # 事件循环随 asyncio.run 结束，关闭其中创建的 LLM 客户端与所有共享连接池
+            await close_async_clients()
+            await close_async_http_clients()
 
-    return idlist, search_context
+    return asyncio.run(run())
 
 if __name__ == "__main__":
     # print(search_paper_id_gs("请帮我找近5年MIT发表的关于大语言模型的SCI论文，英文文献，按年份排序。"))
@@ -1,8 +1,5 @@
-
-import asyncio
-from new_tool import search_paper_id_gs_tool
+from new_tool import search_paper_id_gs_tool_async
 
 async def search_paper_id_gs(query):
-    loop = asyncio.get_event_loop()
-    # 把同步函数放入线程池运行，避免阻塞
-    return await loop.run_in_executor(None, search_paper_id_gs_tool, query)
\ No newline at end of file
+    # 原生异步：标题查询走共享连接池，不再整体占用一个线程池线程
+    return await search_paper_id_gs_tool_async(query)
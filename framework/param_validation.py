@@ -0,0 +1,149 @@
+import inspect
+import json
+
+from typing_extensions import Annotated, get_args, get_origin, get_type_hints
+
+import apis
+
+# 参数文档中含有该说明时，字符串按逗号拆分为列表
+COMMA_SEPARATED_DOC = "逗号分隔"
+
+# LLM 生成参数时常见的多余字段，直接丢弃
+DROPPED_PARAMS = {"use_topic"}
+
+_TRUE = {"true", "yes", "1"}
+_FALSE = {"false", "no", "0"}
+
+
+class ParamValidationError(ValueError):
+    """参数在本地校验失败，请求未发出"""
+
+
+def _to_list(name, value, comma_separated=False):
+    """字符串只有在参数文档注明用逗号分隔时才拆分，否则（如标题中本身带逗号）整体作为一个元素"""
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            try:
+                parsed = json.loads(text)
+            except ValueError:
+                parsed = None
+            if isinstance(parsed, list):
+                return parsed
+        if comma_separated:
+            return [v.strip() for v in text.split(",") if v.strip()]
+        return [text] if text else []
+    if isinstance(value, (int, float)):
+        return [value]
+    raise ParamValidationError(f"{name} 应为列表，实际为 {type(value).__name__}")
+
+
+def _to_int(name, value):
+    if isinstance(value, bool):
+        raise ParamValidationError(f"{name} 应为整数，实际为 bool")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value.strip())
+    raise ParamValidationError(f"{name} 应为整数，实际为 {value!r}")
+
+
+def _to_bool(name, value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, str)) and str(value).strip().lower() in _TRUE | _FALSE:
+        return str(value).strip().lower() in _TRUE
+    raise ParamValidationError(f"{name} 应为布尔值，实际为 {value!r}")
+
+
+def _to_str(name, value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], str):
+        return value[0]
+    raise ParamValidationError(f"{name} 应为字符串，实际为 {type(value).__name__}")
+
+
+_COERCERS = {int: _to_int, bool: _to_bool, str: _to_str}
+
+
+class ParamValidator:
+    """
+    由 apis.py 中函数签名编译出的参数校验器：
+    - 丢弃 None 值和 DROPPED_PARAMS；已知参数的空字符串（PLAN_PROMPT 约定的空值）同样视为未传
+    - 别名：详情接口的 ids 映射到其 *_ids 参数，单数形式映射到列表参数（title -> titles）
+    - 按 Annotated 中的类型转换，无法转换时抛出 ParamValidationError；
+      列表参数的字符串只在文档注明逗号分隔时拆分
+    - 详情接口的 ID 列表不能为空
+    """
+
+    def __init__(self, fn):
+        self.name = fn.__name__
+        hints = get_type_hints(fn, include_extras=True)
+        self.types = {}
+        self.comma_separated = set()
+        for name in inspect.signature(fn).parameters:
+            hint = hints.get(name)
+            if get_origin(hint) is Annotated:
+                self.types[name], *metadata = get_args(hint)
+                if any(COMMA_SEPARATED_DOC in getattr(m, "documentation", "") for m in metadata):
+                    self.comma_separated.add(name)
+            else:
+                self.types[name] = hint
+        self.aliases = {}
+        id_lists = [name for name, t in self.types.items() if t is list and name.endswith("_ids")]
+        is_detail = self.name.endswith("_detail")
+        if is_detail and len(id_lists) == 1:
+            self.aliases["ids"] = id_lists[0]
+        for name, t in self.types.items():
+            if t is list and name.endswith("s") and name[:-1] not in self.types:
+                self.aliases.setdefault(name[:-1], name)
+        self.required = id_lists if is_detail else []
+
+    def validate(self, params, strict=False):
+        """返回校验转换后的新参数字典；strict 为 True 时未知参数报错，否则原样保留"""
+        cleaned = {}
+        for key, value in (params or {}).items():
+            if value is None or key in DROPPED_PARAMS:
+                continue
+            name = key if key in self.types else self.aliases.get(key, key)
+            if name not in self.types:
+                if strict:
+                    raise ParamValidationError(f"{self.name} 不支持参数 {key}，可用参数: {', '.join(self.types)}")
+                cleaned[key] = value
+                continue
+            if isinstance(value, str) and not value.strip():
+                continue
+            if name in cleaned:
+                raise ParamValidationError(f"{self.name} 参数 {key} 与 {name} 重复")
+            if self.types[name] is list:
+                cleaned[name] = _to_list(name, value, name in self.comma_separated)
+                continue
+            coerce = _COERCERS.get(self.types[name])
+            cleaned[name] = coerce(name, value) if coerce else value
+        for name in self.required:
+            if not cleaned.get(name):
+                raise ParamValidationError(f"{self.name} 缺少必填参数 {name}")
+        return cleaned
+
+
+# 模块导入时编译一次，之后每次校验只做字典查找和类型转换
+VALIDATORS = {
+    name: ParamValidator(fn)
+    for name, fn in inspect.getmembers(apis, inspect.iscoroutinefunction)
+    if name.startswith("search_")
+}
+
+
+def validate_params(api_name, params, strict=False):
+    """按 api_name 对应的校验器处理参数，没有对应校验器时原样返回"""
+    validator = VALIDATORS.get(api_name)
+    if validator is None:
+        return params
+    return validator.validate(params, strict=strict)
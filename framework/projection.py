@@ -0,0 +1,40 @@
+import json
+
+from cache import make_key
+
+# orjson 为可选依赖：直接从 bytes 解码且比标准库快数倍，未安装时退回 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(raw):
+    """解码 JSON 响应体（bytes 或 str）"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def fields_tag(fields):
+    """字段投影的稳定标识，用于区分缓存 / 夹具中不同投影的结果；不投影时为空串"""
+    return "" if not fields else "|" + make_key(sorted(fields))[:12]
+
+
+def project(response, fields):
+    """
+    只保留 response["data"] 中每条记录的 fields 字段
+    非 dict 的记录（如纯 ID 字符串）原样保留；fields 为空时不做投影
+    """
+    if not fields or not isinstance(response, dict):
+        return response
+    data = response.get("data")
+    if not isinstance(data, list):
+        return response
+    return {
+        **response,
+        "data": [
+            {key: item[key] for key in fields if key in item} if isinstance(item, dict) else item
+            for item in data
+        ],
+    }
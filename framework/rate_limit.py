@@ -0,0 +1,207 @@
+import asyncio
+import random
+import threading
+import time
+
+from config import (
+    PROVIDER_LIMITS,
+    CHATGLM_API_BASE,
+    DEEPSEEK_API_BASE,
+    ARK_API_BASE,
+)
+
+# 并发名额已满时的轮询间隔（秒）
+POLL_INTERVAL = 0.05
+
+# base_url 能唯一确定服务商的情况；云雾等聚合平台需要再按模型名区分
+_BASE_URL_PROVIDERS = {
+    ARK_API_BASE: "ark",
+    DEEPSEEK_API_BASE: "deepseek",
+    CHATGLM_API_BASE: "chatglm",
+}
+_MODEL_PREFIX_PROVIDERS = [
+    ("gemini", "gemini"),
+    ("gpt", "gpt"),
+    ("claude", "claude"),
+    ("qwen", "qwen"),
+    ("deepseek", "deepseek"),
+    ("glm", "chatglm"),
+]
+
+
+def provider_for(model, base_url):
+    """根据 base_url 和模型名推断服务商名称（对应 config.PROVIDER_LIMITS 的键）"""
+    if base_url in _BASE_URL_PROVIDERS:
+        return _BASE_URL_PROVIDERS[base_url]
+    model = (model or "").lower()
+    for prefix, provider in _MODEL_PREFIX_PROVIDERS:
+        if model.startswith(prefix):
+            return provider
+    return "default"
+
+
+def estimate_tokens(messages):
+    """粗略估计请求的 token 数（中英文混合按每 2 个字符 1 个 token 估计）"""
+    return max(1, sum(len(str(m.get("content") or "")) for m in messages) // 2)
+
+
+def is_rate_limit_error(e):
+    """判断异常是否为服务商限流（HTTP 429）"""
+    if getattr(e, "status_code", None) == 429:
+        return True
+    message = str(e).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+class TokenBucket:
+    """令牌桶：rate 为每秒补充的令牌数，capacity 为桶容量（允许的突发量）"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """取走 amount 个令牌还需等待的秒数，0 表示现在即可取"""
+        self._refill(now)
+        # 单次请求超过桶容量时按桶满处理，避免永远无法获取
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """按实际用量修正：amount > 0 退还令牌，amount < 0 追加扣除（可暂时为负）"""
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ProviderLimiter:
+    """
+    单个服务商的限流器：
+    - 令牌桶分别限制每秒请求数（rps）和每分钟 token 数（tpm）
+    - 在途并发上限按 AIMD 自适应：成功且延迟正常时加性增加，
+      遇到 429 乘性减半，延迟超过 latency_target 时小幅下调
+    """
+
+    def __init__(self, name, rps=None, tpm=None, max_concurrency=16, min_concurrency=1,
+                 initial_concurrency=None, latency_target=None, backoff_base=1.0, backoff_max=60.0):
+        self.name = name
+        self.requests = TokenBucket(rps, max(1.0, rps)) if rps else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(initial_concurrency or max_concurrency)
+        self.latency_target = latency_target
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.total_requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens):
+        """尝试占用一个并发名额和相应令牌，成功返回 0，否则返回建议等待秒数"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.in_flight >= int(self.limit):
+                return POLL_INTERVAL
+            wait = 0.0
+            if self.requests is not None:
+                wait = max(wait, self.requests.wait_time(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            self.in_flight += 1
+            self.total_requests += 1
+            return 0.0
+
+    async def acquire(self, tokens=1):
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens=1):
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def release(self, latency, rate_limited=False, tokens_estimated=0, tokens_used=None, cancelled=False):
+        """
+        归还并发名额，并根据本次结果调整并发上限与 token 预算
+        cancelled 为 True（请求被取消，没有结果）时只归还名额
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if cancelled:
+                return
+            if rate_limited:
+                self.rate_limited += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            elif self.latency_target and latency > self.latency_target:
+                self.limit = max(self.min_concurrency, self.limit * 0.9)
+            else:
+                # 每个“窗口”（约 limit 次成功）并发上限 +1
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            if self.tokens is not None and tokens_used is not None:
+                self.tokens.adjust(tokens_estimated - tokens_used)
+
+    def backoff(self, attempt):
+        """429 后的退避时间（指数退避 + 抖动），期间暂停该服务商的新请求"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "requests": self.total_requests,
+                "rate_limited": self.rate_limited,
+            }
+
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(model, base_url):
+    """获取 (model, base_url) 所属服务商的限流器，进程内共享"""
+    name = provider_for(model, base_url)
+    limiter = _LIMITERS.get(name)
+    if limiter is None:
+        with _LIMITERS_LOCK:
+            limiter = _LIMITERS.get(name)
+            if limiter is None:
+                limits = PROVIDER_LIMITS.get(name, PROVIDER_LIMITS["default"])
+                limiter = ProviderLimiter(name, **limits)
+                _LIMITERS[name] = limiter
+    return limiter
+
+
+def limiter_stats():
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+from cache import make_key
+from config import REPLAY_MODE, REPLAY_FIXTURE_PATH, REPLAY_LATENCY, REPLAY_LATENCY_JITTER
+
+REPLAY_OFF = "off"
+REPLAY_RECORD = "record"  # 正常请求，并把请求与响应写入夹具文件
+REPLAY_REPLAY = "replay"  # 不发请求，从夹具文件返回响应并模拟延迟
+REPLAY_MODES = (REPLAY_OFF, REPLAY_RECORD, REPLAY_REPLAY)
+
+
+class ReplayMiss(KeyError):
+    """回放模式下夹具文件中没有对应的请求"""
+
+
+class FixtureStore:
+    """
+    夹具存储：JSON Lines 文件，每行 {"key", "kind", "request", "response"}
+    key 为 (kind, request) 的哈希，首次访问时整体加载到内存
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            entry = json.loads(line)
+                            self._entries[entry["key"]] = entry["response"]
+        return self._entries
+
+    def get(self, key):
+        with self._lock:
+            entries = self._load()
+            if key not in entries:
+                raise ReplayMiss(f"回放夹具中没有匹配的请求 (key={key})")
+            return entries[key]
+
+    def put(self, key, kind, request, response):
+        line = json.dumps({"key": key, "kind": kind, "request": request, "response": response},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            self._load()[key] = json.loads(line)["response"]
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+
+store = FixtureStore(REPLAY_FIXTURE_PATH)
+_mode = REPLAY_MODE
+_latency = dict(REPLAY_LATENCY)
+
+
+def set_replay_mode(mode, fixture_path=None, latency=None):
+    """
+    切换录制/回放模式
+    fixture_path: 夹具文件路径，None 表示沿用当前文件
+    latency: 覆盖部分调用类型的模拟延迟，如 {"llm": 0.5}
+    """
+    global _mode, store
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"未知的回放模式: {mode}，可选值: {REPLAY_MODES}")
+    _mode = mode
+    if fixture_path is not None:
+        store = FixtureStore(fixture_path)
+    if latency:
+        _latency.update(latency)
+
+
+def get_replay_mode():
+    return _mode
+
+
+def replay_key(kind, request):
+    return make_key("replay", kind, request)
+
+
+def synthetic_latency(kind):
+    base = _latency.get(kind, 0.0)
+    return max(0.0, random.uniform(base * (1 - REPLAY_LATENCY_JITTER), base * (1 + REPLAY_LATENCY_JITTER)))
+
+
+def lookup(kind, request):
+    """回放模式下直接读取夹具（不含延迟），供需要自行控制延迟的调用方使用"""
+    return store.get(replay_key(kind, request))
+
+
+def record(kind, request, response):
+    store.put(replay_key(kind, request), kind, request, response)
+
+
+async def replay_async(kind, request, fn):
+    """
+    异步调用的录制/回放入口：fn 为无参协程函数，负责真正的网络请求
+    off: 直接调用；record: 调用并写入夹具；replay: 读取夹具并 asyncio.sleep 模拟延迟
+    """
+    if _mode == REPLAY_OFF:
+        return await fn()
+    if _mode == REPLAY_REPLAY:
+        response = lookup(kind, request)
+        await asyncio.sleep(synthetic_latency(kind))
+        return response
+    response = await fn()
+    record(kind, request, response)
+    return response
+
+
+def replay_sync(kind, request, fn):
+    """replay_async 的阻塞版本"""
+    if _mode == REPLAY_OFF:
+        return fn()
+    if _mode == REPLAY_REPLAY:
+        response = lookup(kind, request)
+        time.sleep(synthetic_latency(kind))
+        return response
+    response = fn()
+    record(kind, request, response)
+    return response
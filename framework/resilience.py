@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import random
+import time
+
+import httpx
+
+from config import API_CONFIG, API_RESILIENCE_DEFAULTS
+
+# 延迟直方图的桶上界（秒），最后一个桶收集所有更慢的请求
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, float("inf"))
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求未发出直接失败"""
+
+
+def is_retryable(e):
+    """超时、连接错误、429 和 5xx 可以重试；其余 4xx 是请求本身的问题，重试无意义"""
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        return status == 429 or status >= 500
+    # 本地构造请求出错（非法请求头、不支持的协议等）重试也不会成功
+    return isinstance(e, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError, asyncio.TimeoutError))
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图，分位数按所在桶的上界估计"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, latency):
+        self.counts[bisect.bisect_left(self.buckets, latency)] += 1
+        self.total += 1
+        self.sum += latency
+
+    def percentile(self, p):
+        if not self.total:
+            return None
+        rank = self.total * p / 100.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.total,
+            "mean": round(self.sum / self.total, 3) if self.total else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.counts) if c},
+        }
+
+
+class CircuitBreaker:
+    """
+    连续失败 failure_threshold 次后打开，reset_timeout 秒内直接拒绝请求；
+    到期后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self):
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def release_probe(self):
+        """探测请求被取消、没有结果时归还探测名额，状态不变"""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class EndpointPolicy:
+    """
+    单个接口的容错策略：超时、带抖动的指数退避重试、重试预算、熔断与延迟直方图
+
+    重试预算：每个请求存入 retry_ratio 个令牌，每次重试取走 1 个，
+    接口整体故障时重试总量不超过正常请求量的 retry_ratio 倍，避免重试风暴
+    """
+
+    def __init__(self, name, timeout=10.0, retries=2, backoff_base=0.5, backoff_max=8.0,
+                 failure_threshold=5, reset_timeout=30.0, retry_ratio=0.2, retry_budget=10.0):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_ratio = retry_ratio
+        self.retry_budget_max = retry_budget
+        self.retry_budget = retry_budget
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.retried = 0
+        self.failed = 0
+
+    def backoff(self, attempt):
+        # full jitter：在 [0, 指数退避上限] 内均匀取值，避免各请求同时重试
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _take_retry(self):
+        if self.retry_budget < 1:
+            return False
+        self.retry_budget -= 1
+        return True
+
+    async def call(self, send):
+        """
+        send(timeout) 返回发出请求的协程，失败时抛异常
+        熔断打开时抛 CircuitOpenError；重试用尽后抛出最后一次的异常
+        """
+        self.calls += 1
+        self.retry_budget = min(self.retry_budget_max, self.retry_budget + self.retry_ratio)
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.failed += 1
+                raise CircuitOpenError(f"{self.name} 熔断中，{self.breaker.reset_timeout} 秒内暂停请求")
+            start = time.monotonic()
+            try:
+                result = await send(self.timeout)
+            except Exception as e:
+                self.latency.observe(time.monotonic() - start)
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # 请求本身有误不代表接口故障，释放半开状态的探测名额
+                    self.breaker.record_success()
+                if not retryable or attempt >= self.retries or not self._take_retry():
+                    self.failed += 1
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self.retried += 1
+                print(f"[{self.name}] 第 {attempt} 次重试（{delay:.2f} 秒后）: {e!r}")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # 被取消（wait_for 超时、批次取消等）时必须归还探测名额，否则熔断器一直拒绝请求
+                self.breaker.release_probe()
+                raise
+            self.latency.observe(time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rejected": self.breaker.rejected,
+            "latency": self.latency.snapshot(),
+        }
+
+
+_POLICIES = {}
+
+
+def endpoint_policy(api_name):
+    """获取接口的容错策略（进程内共享），配置取 API_CONFIG 中的条目，缺省项用 API_RESILIENCE_DEFAULTS"""
+    policy = _POLICIES.get(api_name)
+    if policy is None:
+        settings = dict(API_RESILIENCE_DEFAULTS)
+        settings.update({k: v for k, v in API_CONFIG.get(api_name, {}).items() if k in API_RESILIENCE_DEFAULTS})
+        policy = _POLICIES[api_name] = EndpointPolicy(api_name, **settings)
+    return policy
+
+
+def endpoint_stats():
+    return {name: policy.stats() for name, policy in _POLICIES.items()}
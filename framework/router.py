@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+import math
+import time
+from collections import deque
+
+from config import (
+    LLM_PROVIDERS,
+    LLM_ROUTE_POLICY,
+    LLM_ROUTE_PROVIDERS,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_DEFAULT_DELAY,
+)
+from llm import async_llm_client
+
+POLICIES = ("cheapest", "fastest", "round_robin")
+
+# 每个服务商保留的延迟样本数，以及计算分位数所需的最少样本数
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 5
+
+
+def percentile(samples, p):
+    """最近秩法分位数，samples 为空时返回 None"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _is_good(result):
+    return isinstance(result, str) and result.strip() != ""
+
+
+class LLMRouter:
+    """
+    多服务商路由：按策略为每次调用选择主服务商
+    - cheapest: 按 cost 从低到高
+    - fastest: 按最近延迟的 p50 从低到高（没有样本的服务商优先，以便采样）
+    - round_robin: 轮询
+    主请求耗时超过其延迟分位数（hedge_percentile）时，向排名第二的服务商发起对冲请求，
+    取先返回的有效结果并取消另一个；主请求快速失败时也会立即切换到第二个服务商。
+    """
+
+    def __init__(self, providers=None, policy="fastest", hedge_percentile=LLM_HEDGE_PERCENTILE,
+                 default_hedge_delay=LLM_HEDGE_DEFAULT_DELAY):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的路由策略: {policy}，可选值: {POLICIES}")
+        providers = providers or list(LLM_PROVIDERS)
+        self.providers = {name: LLM_PROVIDERS[name] for name in providers}
+        self.policy = policy
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.latencies = {name: deque(maxlen=LATENCY_WINDOW) for name in self.providers}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._round_robin = itertools.count()
+
+    def rank(self):
+        """按当前策略返回服务商名称列表，第一个为主服务商"""
+        names = list(self.providers)
+        if self.policy == "cheapest":
+            return sorted(names, key=lambda n: self.providers[n].get("cost", float("inf")))
+        if self.policy == "fastest":
+            return sorted(names, key=lambda n: percentile(self.latencies[n], 50) or 0.0)
+        start = next(self._round_robin) % len(names)
+        return names[start:] + names[:start]
+
+    def hedge_delay(self, name):
+        samples = self.latencies[name]
+        if len(samples) < MIN_SAMPLES:
+            return self.default_hedge_delay
+        return percentile(samples, self.hedge_percentile)
+
+    async def _call(self, name, prompt, query, stage=None):
+        provider = self.providers[name]
+        usage = {}
+        start = time.monotonic()
+        result = await async_llm_client(
+            prompt=prompt,
+            query=query,
+            model=provider["model"],
+            api_key=provider["api_key"],
+            base_url=provider["base_url"],
+            usage=usage,
+            stage=stage,
+        )
+        # 只记录成功请求的延迟，失败（多为快速报错）会拉低分位数
+        if _is_good(result):
+            self.latencies[name].append(time.monotonic() - start)
+        return name, result, usage
+
+    async def complete(self, prompt, query, usage=None, stage=None):
+        """与 async_llm_client 相同的契约：返回文本，全部失败时返回最后一个 {"error": ...}；usage 写入胜出请求的用量"""
+        order = self.rank()
+        primary = order[0]
+        backup = order[1] if len(order) > 1 else None
+
+        pending = {asyncio.create_task(self._call(primary, prompt, query, stage))}
+        hedged = backup is None
+        last_result = {"error": "没有可用的服务商"}
+        try:
+            while pending:
+                timeout = None if hedged else self.hedge_delay(primary)
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print(f"⏱️ {primary} 超过 p{self.hedge_percentile} 延迟，向 {backup} 发起对冲请求")
+                    self.hedges += 1
+                    pending.add(asyncio.create_task(self._call(backup, prompt, query, stage)))
+                    hedged = True
+                    continue
+                for task in done:
+                    name, result, call_usage = task.result()
+                    if _is_good(result):
+                        if name != primary:
+                            self.hedge_wins += 1
+                        if usage is not None:
+                            usage.update(call_usage)
+                        return result
+                    last_result = result
+                if not hedged:
+                    # 主请求已失败，立即改用第二个服务商
+                    pending.add(asyncio.create_task(self._call(backup, prompt, query, stage)))
+                    hedged = True
+            return last_result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50": {n: percentile(s, 50) for n, s in self.latencies.items()},
+            "samples": {n: len(s) for n, s in self.latencies.items()},
+        }
+
+
+_router = None
+
+
+def get_router():
+    """按 config.LLM_ROUTE_POLICY 创建的全局路由器；未配置策略时返回 None"""
+    global _router
+    if _router is None and LLM_ROUTE_POLICY is not None:
+        _router = LLMRouter(providers=LLM_ROUTE_PROVIDERS, policy=LLM_ROUTE_POLICY)
+    return _router
+
+
+async def routed_llm_client(prompt, query, **kwargs):
+    """
+    配置了 LLM_ROUTE_POLICY 时经路由器选择服务商（带对冲请求），
+    否则等同于 async_llm_client(prompt, query, **kwargs)，使用调用点指定的模型
+    """
+    router = get_router()
+    if router is None:
+        return await async_llm_client(prompt=prompt, query=query, **kwargs)
+    return await router.complete(prompt, query, usage=kwargs.get("usage"), stage=kwargs.get("stage"))
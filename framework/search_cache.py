@@ -0,0 +1,114 @@
+import replay
+from cache import DiskCache, make_key
+from config import (
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_NEGATIVE_TTL,
+    SEARCH_CACHE_MAX_ENTRIES,
+)
+
+# 不参与缓存键的参数：size 单独处理，已缓存的结果条数足够时直接截取
+SIZE_PARAM = "size"
+
+search_cache = DiskCache(SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES)
+
+
+def _normalize_size(size):
+    """size 统一为 int；空字符串等无法识别的值视为未指定（None）"""
+    if isinstance(size, bool):
+        return None
+    if isinstance(size, int):
+        return size
+    if isinstance(size, float) and size.is_integer():
+        return int(size)
+    if isinstance(size, str) and size.strip().isdigit():
+        return int(size.strip())
+    return None
+
+
+def _is_id_field(name):
+    return name.endswith("_id") or name.endswith("_ids") or name == "ids"
+
+
+def _canonical_value(value, keep_case):
+    if isinstance(value, str):
+        value = value.strip()
+        return value if keep_case else value.lower()
+    if isinstance(value, (list, tuple, set)):
+        values = [_canonical_value(v, keep_case) for v in value if v is not None]
+        # 列表内顺序不影响检索结果
+        return sorted(values, key=lambda v: repr(v))
+    if isinstance(value, dict):
+        return canonicalize(value)
+    return value
+
+
+def canonicalize(params):
+    """
+    规范化检索参数：去掉 None 和 size，字符串去首尾空白并统一小写（ID 字段保留大小写），
+    列表排序；键顺序由 make_key 统一
+    """
+    return {
+        name: _canonical_value(value, _is_id_field(name))
+        for name, value in (params or {}).items()
+        if value is not None and name != SIZE_PARAM
+    }
+
+
+def _classify(response):
+    """
+    判断响应能否缓存：返回 "ok" / "empty"，错误或无法识别的响应返回 None
+    只有 data 明确为空列表才算空结果，缺少 data 的响应（如 {"code": 500, "msg": ...}）不缓存
+    """
+    if not isinstance(response, dict) or "error" in response or response.get("success") is False:
+        return None
+    data = response.get("data")
+    if isinstance(data, list) and not data:
+        return "empty"
+    if not data:
+        return None
+    return "ok"
+
+
+def _covers(entry, size):
+    """已缓存的结果是否足够回答请求 size 条"""
+    cached_size = _normalize_size(entry["size"])
+    if cached_size == size:
+        return True
+    if size is None or cached_size is None:
+        return False
+    data = entry["response"].get("data")
+    # 缓存时就没取满说明已是全部结果
+    return cached_size >= size or (isinstance(data, list) and len(data) < cached_size)
+
+
+def _slice(response, size):
+    data = response.get("data")
+    if size is None or not isinstance(data, list) or len(data) <= size:
+        return response
+    return {**response, "data": data[:size]}
+
+
+async def cached_search(kind, params, fetch, fields=None):
+    """
+    带缓存的检索调用：kind 区分接口，params 为检索参数，fetch 为实际发出请求的无参协程函数，
+    fields 为 fetch 使用的字段投影（不同投影的结果分开缓存）
+    有结果的响应缓存 SEARCH_CACHE_TTL 秒，空结果缓存 SEARCH_CACHE_NEGATIVE_TTL 秒，错误不缓存
+    录制 / 回放模式下不读写缓存，每次都经过 fetch 中的 replay 钩子，保证夹具完整
+    """
+    if not SEARCH_CACHE_ENABLED or replay.get_replay_mode() != replay.REPLAY_OFF:
+        return await fetch()
+    size = _normalize_size((params or {}).get(SIZE_PARAM))
+    key = make_key("search", kind, canonicalize(params), sorted(fields) if fields else None)
+    entry = search_cache.get(key)
+    if entry is not None and _covers(entry, size):
+        return _slice(entry["response"], size)
+
+    response = await fetch()
+    status = _classify(response)
+    if status == "ok":
+        search_cache.set(key, {"size": size, "response": response})
+    elif status == "empty" and SEARCH_CACHE_NEGATIVE_TTL:
+        search_cache.set(key, {"size": size, "response": response}, ttl=SEARCH_CACHE_NEGATIVE_TTL)
+    return response
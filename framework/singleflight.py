@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncCall:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并相同 key 的并发调用：同一时刻只有第一个调用真正执行，
+    其余调用等待并共享它的结果（或异常）。调用结束后 key 即被释放，不做缓存。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # 异步调用按事件循环分组，task 只能在创建它的循环中等待
+        self._async_calls = weakref.WeakKeyDictionary()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """阻塞版本，适用于多线程并发（如线程池中的翻译调用）"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """
+        异步版本，fn 为协程函数
+        共享调用在独立的 task 中执行：某个调用方（包括第一个）被取消不影响其他等待者，
+        所有等待者都被取消后才取消该 task
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        call = calls.get(key)
+        if call is None:
+            call = calls[key] = _AsyncCall(loop.create_task(fn(*args, **kwargs)))
+            call.task.add_done_callback(lambda _: calls.pop(key, None) if calls.get(key) is call else None)
+            self.executed += 1
+        else:
+            self.shared += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def stats(self):
+        return {"executed": self.executed, "shared": self.shared}
@@ -0,0 +1,73 @@
+from difflib import SequenceMatcher
+
+# 与原实现一致：SequenceMatcher 相似度 >= 80 视为同一篇论文
+DEFAULT_THRESHOLD = 80
+
+
+def similarity(a, b):
+    """两个字符串的相似度（0~100），即 SequenceMatcher.ratio() * 100，对词序敏感"""
+    return SequenceMatcher(None, a, b).ratio() * 100
+
+
+class TitleIndex:
+    """
+    网页标题的匹配索引，判定结果与逐对计算 similarity(检索标题.lower(), 网页标题.lower()) 完全一致：
+    - 每个网页标题只预处理一次（SequenceMatcher 缓存第二个序列的字符索引）
+    - 先用长度上界 real_quick_ratio、字符计数上界 quick_ratio 排除不可能达到阈值的标题，
+      只对剩下的标题计算代价较高的 ratio
+    """
+
+    def __init__(self, titles):
+        self.entries = []
+        for title in titles:
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(title.lower())
+            self.entries.append((title, matcher))
+
+    def best_match(self, title, threshold=DEFAULT_THRESHOLD):
+        """返回 (网页标题, 相似度)，没有达到阈值的标题时返回 None"""
+        query = title.lower()
+        best = None
+        for candidate, matcher in self.entries:
+            matcher.set_seq1(query)
+            if matcher.real_quick_ratio() * 100 < threshold or matcher.quick_ratio() * 100 < threshold:
+                continue
+            score = matcher.ratio() * 100
+            if score >= threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+
+
+if __name__ == "__main__":
+    # 微基准：20 个网页标题 x 30 个检索结果标题，对比逐对 SequenceMatcher 与索引匹配
+    import random
+    import time
+
+    words = ("learning deep neural network graph language model attention transformer retrieval "
+             "augmented generation efficient sparse reasoning multimodal vision benchmark survey").split()
+    random.seed(0)
+    context = [" ".join(random.choice(words) for _ in range(random.randint(6, 14))).title() for _ in range(20)]
+    results = []
+    for t in context:
+        noisy = list(t)
+        for _ in range(random.randint(0, 3)):
+            noisy[random.randrange(len(noisy))] = random.choice("abcdefgh")
+        results.append("".join(noisy) + random.choice(["", ".", " (Extended Abstract)"]))
+    results += [" ".join(random.choice(words) for _ in range(10)) for _ in range(10)]
+
+    def baseline():
+        return [any(similarity(r.lower(), c.lower()) >= DEFAULT_THRESHOLD for c in context) for r in results]
+
+    def indexed():
+        index = TitleIndex(context)
+        return [index.best_match(r) is not None for r in results]
+
+    rounds = 200
+    for name, fn in (("SequenceMatcher", baseline), ("TitleIndex", indexed)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            matched = fn()
+        elapsed = (time.perf_counter() - start) / rounds * 1000
+        print(f"{name:16s} {elapsed:8.3f} ms/次  匹配 {sum(matched)}/{len(results)}")
+    agree = sum(a == b for a, b in zip(baseline(), indexed()))
+    print(f"两种方法结论一致: {agree}/{len(results)}")
@@ -1,64 +1,119 @@
-import requests
 import asyncio
+import weakref
 from typing import List, Optional
 
+from config import (
+    CUSTOM_SERVER_MAX_CONNECTIONS,
+    CUSTOM_SERVER_MAX_KEEPALIVE_CONNECTIONS,
+    CUSTOM_SERVER_MAX_CONCURRENCY,
+    CUSTOM_SERVER_DEFAULT_TIMEOUT,
+    CUSTOM_SERVER_TIMEOUTS,
+)
+from http_pool import get_async_http_client, close_async_http_clients
+from replay import replay_async
+from projection import loads, project
+
 CUSTOM_SERVER_BASE = "http://36.103.177.237:8507/"
+POOL_NAME = "custom_server"
+
+# 每个事件循环一个信号量，限制同时在途的请求数
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+
+def _semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = _SEMAPHORES[loop] = asyncio.Semaphore(CUSTOM_SERVER_MAX_CONCURRENCY)
+    return semaphore
+
 
+def _client():
+    return get_async_http_client(
+        POOL_NAME,
+        max_connections=CUSTOM_SERVER_MAX_CONNECTIONS,
+        max_keepalive_connections=CUSTOM_SERVER_MAX_KEEPALIVE_CONNECTIONS,
+        timeout=CUSTOM_SERVER_DEFAULT_TIMEOUT,
+    )
 
-async def call_custom_server(endpoint: str, params: dict = None):
-    """调用自定义服务器API"""
+
+async def close_custom_server_client():
+    """关闭当前事件循环中自定义服务器的共享连接（在事件循环结束前调用）"""
+    await close_async_http_clients(POOL_NAME)
+
+
+async def call_custom_server(endpoint: str, params: dict = None, fields: Optional[List[str]] = None):
+    """
+    调用自定义服务器API
+    fields 为字段投影：解码后立即只保留 data 中每条记录的这些字段，完整对象不会传出本函数
+    """
     if params is None:
         params = {}
+    request = {"endpoint": endpoint, "params": params}
+    if fields:
+        request["fields"] = sorted(fields)
     
+    # 录制/回放模式下由 replay 决定是否真正发出请求
+    return await replay_async(
+        "custom_server",
+        request,
+        lambda: _post_custom_server(endpoint, params, fields),
+    )
+
+
+async def _post_custom_server(endpoint: str, params: dict, fields: Optional[List[str]] = None):
     url = CUSTOM_SERVER_BASE + endpoint
     headers = {"Content-Type": "application/json"}
+    timeout = CUSTOM_SERVER_TIMEOUTS.get(endpoint, CUSTOM_SERVER_DEFAULT_TIMEOUT)
     
     try:
-        response = await asyncio.to_thread(requests.post, url=url, json=params, headers=headers)
-        return response.json()
+        # 共享连接池 + 信号量限流，避免大量并发调用占满线程池、反复建连
+        async with _semaphore():
+            response = await _client().post(url, json=params, headers=headers, timeout=timeout)
+        return project(loads(response.content), fields)
     except Exception as e:
         print(f"API调用失败: {e}")
         raise
 
 
-async def search_paper_id_tool(**kwargs):
+async def search_paper_id_tool(fields=None, **kwargs):
     """搜索论文"""
-    return await call_custom_server("search_paper_id", kwargs)
+    return await call_custom_server("search_paper_id", kwargs, fields)
 
 
-async def search_paper_detail_tool(**kwargs):
+async def search_paper_detail_tool(fields=None, **kwargs):
     """获取论文详情"""
-    return await call_custom_server("search_paper_detail", kwargs)
+    return await call_custom_server("search_paper_detail", kwargs, fields)
 
 
-async def search_author_id_tool(**kwargs):
+async def search_author_id_tool(fields=None, **kwargs):
     """搜索作者"""
-    return await call_custom_server("search_author_id", kwargs)
+    return await call_custom_server("search_author_id", kwargs, fields)
 
 
-async def search_author_detail_tool(**kwargs):
+async def search_author_detail_tool(fields=None, **kwargs):
     """获取作者详情"""
-    return await call_custom_server("search_author_detail", kwargs)
+    return await call_custom_server("search_author_detail", kwargs, fields)
 
 
-async def search_venue_id_tool(**kwargs):
+async def search_venue_id_tool(fields=None, **kwargs):
     """搜索期刊/会议"""
-    return await call_custom_server("search_venue_id", kwargs)
+    return await call_custom_server("search_venue_id", kwargs, fields)
 
 
-async def search_venue_detail_tool(**kwargs):
+async def search_venue_detail_tool(fields=None, **kwargs):
     """获取期刊/会议详情"""
-    return await call_custom_server("search_venue_detail", kwargs)
+    return await call_custom_server("search_venue_detail", kwargs, fields)
 
 
-async def search_org_id_tool(**kwargs):
+async def search_org_id_tool(fields=None, **kwargs):
     """搜索机构"""
-    return await call_custom_server("search_org_id", kwargs)
+    return await call_custom_server("search_org_id", kwargs, fields)
 
 
-async def search_org_detail_tool(**kwargs):
+async def search_org_detail_tool(fields=None, **kwargs):
     """获取机构详情"""
-    return await call_custom_server("search_org_detail", kwargs)
+    return await call_custom_server("search_org_detail", kwargs, fields)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# framework 下的模块按裸模块名互相导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "framework"))
@@ -0,0 +1,39 @@
+import asyncio
+import gc
+
+import pytest
+
+from detail_batcher import DetailBatcher
+
+
+def test_batch_task_kept_alive_and_results_scattered():
+    async def run():
+        async def fetch(ids):
+            await asyncio.sleep(0.01)
+            gc.collect()
+            return {"data": [{"id": i} for i in ids]}
+
+        batcher = DetailBatcher(fetch, window=0.001)
+        a, b = await asyncio.gather(batcher.get(["1", "2"]), batcher.get(["2", "3"]))
+        return a, b, batcher.batches, len(batcher._tasks)
+
+    a, b, batches, tasks = asyncio.run(run())
+    assert [item["id"] for _, item, _ in a] == ["1", "2"]
+    assert [item["id"] for _, item, _ in b] == ["2", "3"]
+    assert batches == 1 and tasks == 0
+
+
+def test_close_cancels_inflight_batch():
+    async def run():
+        async def fetch(ids):
+            await asyncio.sleep(10)
+
+        batcher = DetailBatcher(fetch, window=0.001)
+        waiter = asyncio.create_task(batcher.get(["1"]))
+        await asyncio.sleep(0.01)
+        await batcher.close()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return len(batcher._tasks)
+
+    assert asyncio.run(run()) == 0
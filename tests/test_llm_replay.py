@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm
+import replay
+from cache import DiskCache
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+BASE_URL = "http://replay.test/v1"
+
+
+@pytest.fixture
+def warm_cache(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path / "llm.sqlite3"))
+    monkeypatch.setattr(llm, "llm_cache", cache)
+    monkeypatch.setattr(llm, "_cache_mode", llm.CACHE_READ_THROUGH)
+    cache.set(llm._request_key("replay-test", BASE_URL, MESSAGES, {}), "cached answer")
+    yield cache
+    replay.set_replay_mode(replay.REPLAY_OFF)
+
+
+def test_record_mode_skips_cache_and_writes_fixture(warm_cache, tmp_path, monkeypatch):
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="fresh answer"))], usage=None)
+    monkeypatch.setattr(llm, "_create_limited", lambda *args: response)
+
+    replay.set_replay_mode(replay.REPLAY_RECORD, str(tmp_path / "fixtures.jsonl"))
+    assert llm.chat_completion(MESSAGES, "replay-test", "test-key", BASE_URL) == "fresh answer"
+
+    replay.set_replay_mode(replay.REPLAY_REPLAY)
+    text, _ = replay.lookup("llm", llm._replay_request("replay-test", MESSAGES, {}))
+    assert text == "fresh answer"
+
+
+def test_off_mode_still_reads_cache(warm_cache):
+    assert llm.chat_completion(MESSAGES, "replay-test", "test-key", BASE_URL) == "cached answer"
@@ -0,0 +1,10 @@
+import llm
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_request_key_depends_on_provider():
+    a = llm._request_key("deepseek-chat", "https://api.deepseek.com/v1", MESSAGES, {})
+    b = llm._request_key("deepseek-chat", "https://other.example/v1", MESSAGES, {})
+    assert a != b
+    assert a == llm._request_key("deepseek-chat", "https://api.deepseek.com/v1/", MESSAGES, {})
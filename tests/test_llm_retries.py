@@ -0,0 +1,46 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm
+import rate_limit
+
+
+class _TooManyRequests(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_POST(self):
+        type(self).hits += 1
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"error": {"message": "rate limited"}}'
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _TooManyRequests)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/v1"
+    httpd.shutdown()
+
+
+def test_429_retried_only_by_rate_limiter(server, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_RATE_LIMIT_RETRIES", 1)
+    monkeypatch.setattr(rate_limit.ProviderLimiter, "backoff", lambda self, attempt: 0.0)
+    _TooManyRequests.hits = 0
+    client = llm.get_client(server, "test-key")
+    assert client.max_retries == 0
+    with pytest.raises(Exception):
+        llm._create_limited(client, "retry-test", [{"role": "user", "content": "hi"}], server, {})
+    limiter = rate_limit.get_limiter("retry-test", server)
+    assert _TooManyRequests.hits == 2
+    assert limiter.rate_limited == 2
@@ -0,0 +1,36 @@
+import asyncio
+from contextlib import aclosing
+
+from apis import _paginate
+
+
+def test_first_page_omits_offset_and_prefetch_cancelled_on_break():
+    calls = []
+    cancelled = []
+
+    async def search(**params):
+        calls.append(params)
+        try:
+            await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            cancelled.append(params.get("offset"))
+            raise
+        offset = params.get("offset", 0)
+        return {"data": [offset + i for i in range(params["size"])]}
+
+    async def run():
+        seen = []
+        async with aclosing(_paginate(search, {"keywords": ["x"], "size": 50}, 3, None)) as items:
+            async for item in items:
+                seen.append(item)
+                if item == 1:
+                    # 让预取请求开始执行后再退出
+                    await asyncio.sleep(0)
+                    break
+        await asyncio.sleep(0.02)
+        return seen
+
+    assert asyncio.run(run()) == [0, 1]
+    assert calls[0] == {"keywords": ["x"], "size": 3}
+    assert calls[1]["offset"] == 3
+    assert cancelled == [3]
@@ -0,0 +1,31 @@
+import pytest
+
+from param_validation import ParamValidationError, validate_params
+
+
+@pytest.mark.parametrize("value", ["", "  "])
+def test_blank_optional_params_are_dropped(value):
+    params = {"keywords": ["graph"], "is_sci": value, "size": value}
+    assert validate_params("search_paper_id", params) == {"keywords": ["graph"]}
+
+
+def test_blank_required_id_list_still_rejected():
+    with pytest.raises(ParamValidationError):
+        validate_params("search_paper_detail", {"paper_ids": ""}, strict=True)
+
+
+def test_invalid_value_still_rejected():
+    with pytest.raises(ParamValidationError):
+        validate_params("search_paper_id", {"size": "ten"})
+
+
+def test_comma_separated_only_where_documented():
+    params = {"titles": "Attention, please: a study", "keywords": "graph, retrieval"}
+    assert validate_params("search_paper_id", params) == {
+        "titles": ["Attention, please: a study"],
+        "keywords": ["graph", "retrieval"],
+    }
+
+
+def test_json_list_string_still_parsed():
+    assert validate_params("search_paper_id", {"titles": '["A, B", "C"]'}) == {"titles": ["A, B", "C"]}
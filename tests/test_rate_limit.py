@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import llm
+from rate_limit import get_limiter
+
+
+class _HangingCompletions:
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def create(self, **kwargs):
+        self.started.set()
+        await asyncio.Event().wait()
+
+
+def test_cancelled_request_releases_slot():
+    async def run():
+        completions = _HangingCompletions()
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        messages = [{"role": "user", "content": "hi"}]
+        task = asyncio.create_task(llm._async_create_limited(client, "cancel-test", messages, "http://cancel.test/v1", {}))
+        await completions.started.wait()
+        limiter = get_limiter("cancel-test", "http://cancel.test/v1")
+        assert limiter.in_flight == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_stream_open_releases_slot(monkeypatch):
+    completions = None
+
+    def fake_client(base_url, api_key):
+        return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    monkeypatch.setattr(llm, "get_async_client", fake_client)
+    monkeypatch.setattr(llm, "_cache_mode", llm.CACHE_BYPASS)
+
+    async def run():
+        nonlocal completions
+        completions = _HangingCompletions()
+        stream = llm.LLMStream([{"role": "user", "content": "hi"}], "cancel-stream-test", "", "http://cancel-stream.test/v1")
+        task = asyncio.create_task(stream.collect())
+        await completions.started.wait()
+        limiter = get_limiter("cancel-stream-test", "http://cancel-stream.test/v1")
+        assert limiter.in_flight == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
@@ -0,0 +1,34 @@
+import asyncio
+
+import httpx
+
+from resilience import CircuitBreaker, EndpointPolicy
+
+
+def test_cancelled_half_open_probe_does_not_wedge_breaker():
+    async def run():
+        policy = EndpointPolicy("probe-test", retries=0, failure_threshold=1, reset_timeout=0.01)
+
+        async def fail(timeout):
+            raise httpx.ConnectError("down")
+
+        async def hang(timeout):
+            await asyncio.sleep(10)
+
+        async def ok(timeout):
+            return "ok"
+
+        try:
+            await policy.call(fail)
+        except httpx.ConnectError:
+            pass
+        assert policy.breaker.state == CircuitBreaker.OPEN
+        await asyncio.sleep(0.02)
+        # 半开状态的探测请求被取消
+        try:
+            await asyncio.wait_for(policy.call(hang), 0.01)
+        except asyncio.TimeoutError:
+            pass
+        return await policy.call(ok), policy.breaker.state
+
+    assert asyncio.run(run()) == ("ok", CircuitBreaker.CLOSED)
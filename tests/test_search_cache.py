@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+import replay
+import search_cache as search_cache_module
+from cache import DiskCache
+from search_cache import _classify, cached_search
+
+
+@pytest.mark.parametrize("response, expected", [
+    ({"data": [{"id": "1"}]}, "ok"),
+    ({"data": []}, "empty"),
+    ({"code": 500, "msg": "internal error"}, None),
+    ({"data": None}, None),
+    ({"error": "timeout"}, None),
+    ({"success": False, "data": []}, None),
+    ("not a dict", None),
+])
+def test_classify(response, expected):
+    assert _classify(response) == expected
+
+
+@pytest.fixture
+def temp_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_cache_module, "search_cache", DiskCache(str(tmp_path / "search.sqlite3")))
+    yield
+    replay.set_replay_mode(replay.REPLAY_OFF)
+
+
+def _fetcher(calls):
+    async def fetch():
+        calls.append(1)
+        return {"data": [{"id": str(i)} for i in range(10)]}
+    return fetch
+
+
+def test_blank_size_after_cached_int_size(temp_cache):
+    calls = []
+
+    async def run():
+        await cached_search("aminer:search_author_id", {"name": "Jie Tang", "size": 10}, _fetcher(calls))
+        return await cached_search("aminer:search_author_id", {"name": "jie tang", "size": ""}, _fetcher(calls))
+
+    response = asyncio.run(run())
+    assert len(response["data"]) == 10
+    assert len(calls) == 2
+
+
+def test_string_size_uses_cached_result(temp_cache):
+    calls = []
+
+    async def run():
+        await cached_search("aminer:search_author_id", {"name": "Jie Tang", "size": 10}, _fetcher(calls))
+        return await cached_search("aminer:search_author_id", {"name": "Jie Tang", "size": "5"}, _fetcher(calls))
+
+    assert len(asyncio.run(run())["data"]) == 5
+    assert len(calls) == 1
+
+
+def test_replay_modes_bypass_cache(temp_cache, tmp_path):
+    calls = []
+    replay.set_replay_mode(replay.REPLAY_RECORD, str(tmp_path / "fixtures.jsonl"))
+
+    async def run():
+        for _ in range(2):
+            await cached_search("search_paper_id", {"keywords": ["graph"], "size": 10}, _fetcher(calls))
+
+    asyncio.run(run())
+    assert len(calls) == 2
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_follower_survives_leader_cancellation():
+    async def run():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "result"
+
+        leader = asyncio.create_task(flight.do_async("k", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do_async("k", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower, calls
+
+    assert asyncio.run(run()) == ("result", 1)
+
+
+def test_shared_call_cancelled_when_all_waiters_leave():
+    async def run():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.create_task(flight.do_async("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for task in waiters:
+            task.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        # key 已释放，新的调用重新执行
+        return await flight.do_async("k", asyncio.sleep, 0, "again")
+
+    assert asyncio.run(run()) == "again"
+
+
+def test_error_shared_with_followers():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(*(flight.do_async("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,43 @@
+from difflib import SequenceMatcher
+
+import pytest
+
+from title_match import DEFAULT_THRESHOLD, TitleIndex, similarity
+
+CONTEXT = [
+    "Attention Is All You Need",
+    "BERT: Pre-training of Deep Bidirectional Transformers for Language Understanding",
+    "Deep Residual Learning for Image Recognition",
+]
+
+
+@pytest.mark.parametrize("hit, matched", [
+    ("attention is all you need", True),
+    ("Attention Is All You Need.", True),
+    ("Deep Residual Learnng for Image Recogniton", True),
+    # 词序不同、只是子集或超集的标题不算同一篇
+    ("All You Need Is Attention", False),
+    ("Attention Is All You Need in Speech Separation", False),
+    ("Image Recognition for Deep Residual Learning", False),
+    ("Deep Bidirectional Transformers", False),
+])
+def test_threshold_decisions(hit, matched):
+    assert (TitleIndex(CONTEXT).best_match(hit) is not None) is matched
+
+
+@pytest.mark.parametrize("hit", [
+    "attention is all you need",
+    "All You Need Is Attention",
+    "Attention Is All You Need in Speech Separation",
+    "BERT: Pre-training of Deep Bidirectional Transformers",
+    "Deep Residual Learnng for Image Recogniton",
+    "Image Recognition for Deep Residual Learning",
+])
+def test_same_decision_as_pairwise_sequence_matcher(hit):
+    expected = any(SequenceMatcher(None, hit.lower(), c.lower()).ratio() * 100 >= DEFAULT_THRESHOLD for c in CONTEXT)
+    assert (TitleIndex(CONTEXT).best_match(hit) is not None) is expected
+
+
+def test_similarity_is_order_sensitive():
+    assert similarity("a b c d", "a b c d") == 100
+    assert similarity("graph neural network", "network neural graph") < DEFAULT_THRESHOLD